@@ -0,0 +1,2172 @@
+import os
+import subprocess
+import json
+from datetime import datetime
+import pandas as pd
+import numpy as np
+import re
+import threading
+import warnings
+import sys
+import glob
+import argparse
+import tempfile
+import time
+import signal
+import hashlib
+import importlib.util
+import sqlite3
+from contextlib import contextmanager, nullcontext
+from collections import defaultdict, deque
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+try:
+    # Mémoire résidente relevée pendant les étapes profilées ; sans psutil, /proc sous Linux seulement
+    import psutil
+except ImportError:
+    psutil = None
+# Moteur d'écriture xlsx nettement plus rapide qu'openpyxl, utilisé s'il est installé ; seule sa présence
+# est vérifiée ici, pandas l'importe à l'export
+XLSXWRITER = importlib.util.find_spec('xlsxwriter') is not None
+# pyarrow : tables partagées entre processus pour les contrôles par tranches (sinon contrôles en série)
+PYARROW = importlib.util.find_spec('pyarrow') is not None
+try:
+    import pyotdr
+    from pyotdr import sorparse
+except ImportError:
+    pyotdr = None
+    sorparse = None
+
+def flatten_json(y):
+    out = {}
+    def flatten(x, name=''):
+        if isinstance(x, dict):
+            for key in x:
+                flatten(x[key], f'{name}{key}_')
+        elif isinstance(x, list):
+            for i, item in enumerate(x):
+                flatten(item, f'{name}{i}_')
+        else:
+            out[name[:-1]] = x
+    flatten(y)
+    return out
+
+def nombre_workers(nb_taches):
+    # ProcessPoolExecutor refuse plus de 61 workers sous Windows
+    return max(1, min(os.cpu_count() or 1, nb_taches, 61))
+
+def trier_cles(y):
+    # même ordre de clés que le dump JSON de pyotdr (sort_keys=True) : l'ordre des colonnes du rapport en dépend
+    if isinstance(y, dict):
+        return {key: trier_cles(y[key]) for key in sorted(y)}
+    return y
+
+def decoder_sor(sor_file):
+    try:
+        status, results, tracedata = sorparse(sor_file)
+    except SystemExit:
+        # pyotdr appelle sys.exit() sur les fichiers multi-traces / multi-impulsions
+        raise ValueError("format non supporté par pyotdr")
+    if status != "ok":
+        raise ValueError(status)
+    return trier_cles(results), tracedata
+
+def echantillons_trace(lignes):
+    # Lignes "x\ty" de pyotdr (km, dB) -> (pas en km, niveaux float32) ; les abscisses sont régulières
+    valeurs = np.array(''.join(lignes).split(), dtype=np.float64).reshape(-1, 2)
+    if len(valeurs) < 2:
+        return None
+    return (valeurs[-1, 0] - valeurs[0, 0]) / (len(valeurs) - 1), valeurs[:, 1].astype(np.float32)
+
+def convertir_sor_cli(sor_file, flags=0):
+    # Le CLI écrit ses dumps dans son répertoire courant : un dossier temporaire local
+    # évite d'écrire (puis de balayer) le dossier des .sor, souvent sur un partage réseau
+    with tempfile.TemporaryDirectory() as tmp:
+        subprocess.run(['pyotdr', os.path.abspath(sor_file)], cwd=tmp, check=True, creationflags=flags)
+        base = os.path.join(tmp, os.path.splitext(os.path.basename(sor_file))[0])
+        with open(base + '-dump.json', 'r', encoding='utf-8') as f:
+            results = json.load(f)
+        try:
+            with open(base + '-trace.dat', 'r', encoding='utf-8') as f:
+                return results, echantillons_trace(f.readlines())
+        except (OSError, ValueError):
+            return results, None
+
+def extraire_chiffres(val):
+    if pd.isna(val):
+        return ""
+    chiffres = re.findall(r'\d+', str(val))
+    return ''.join(chiffres) if chiffres else ""
+
+def normaliser_indice(val):
+    if pd.isna(val):
+        return ""
+    return str(val)[:6]
+
+def lire_dates(serie):
+    # date/time de pyotdr ("Tue Nov 14 22:16:40 2023 (1700000200 sec)") lu en une passe vectorisée ;
+    # toute autre forme est laissée à pandas, jour en premier
+    extraits = serie.astype(str).str.extract(r'^[A-Za-z]{3} ([A-Za-z]{3} \d{1,2} \d{2}:\d{2}:\d{2} \d{4})', expand=False)
+    dates = pd.to_datetime(extraits, format="%b %d %H:%M:%S %Y", errors='coerce')
+    autres = extraits.isna() & serie.notna()
+    if autres.any():
+        dates[autres] = pd.to_datetime(serie[autres].astype(str), errors='coerce', dayfirst=True)
+    return dates
+
+# Champs des .sor absents du rapport, écartés dès l'extraction (ordre des colonnes = ordre des clés pyotdr) :
+# toute autre clé, y compris propre à un constructeur ou à une version de pyotdr, est reprise comme avant
+CHAMPS_PARAMS_ECARTES = {
+    'BC', 'EOT thr', 'X1', 'X2', 'Y1', 'Y2', 'acquisition offset', 'acquisition offset distance', 'averaging time',
+    'front panel offset', 'loss thr', 'noise floor level', 'num averages', 'num data points',
+    'number of pulse width entries', 'power offset first point', 'refl thr', 'resolution', 'sample spacing',
+    'trace type', 'unit', 'build condition', 'cable code/fiber type', 'fiber type', 'language', 'user offset',
+    'user offset distance', 'noise floor scaling factor', 'acquisition range distance', 'OTDR S/N'
+}
+CHAMPS_EVENTS_ECARTES = {
+    'comments', 'end of curr', 'end of prev', 'peak', 'start of curr', 'start of next', 'Type de ROP'
+}
+# Schéma des tables : libellés répétés en catégories, mesures et numéros en types numériques, dates lues
+# à l'ingestion. Les mesures restent en float64 : en float32, une perte de 0.700 passerait sous un seuil de 0.7.
+TYPES_PARAMS = {
+    'Distance Totale(km)': 'float64', 'Portée(km)': 'Int32', 'Indice de Réfraction': 'category',
+    'Impulsion': 'category', 'Lambda': 'category', 'cable ID': 'category', 'Commentaire': 'category',
+    'fiber ID': 'category', 'location A': 'category', 'location B': 'category', 'Technicien': 'category',
+    'OTDR': 'category', 'module': 'category', 'module S/N': 'category', 'other': 'category', 'Version': 'category',
+    'Fabricant': 'category'
+}
+TYPES_EVENTS = {
+    'Fichier': 'category', 'MétaNommage': 'category', 'N° évenement': 'Int32', 'Distance': 'float64',
+    'Réfléctance': 'float64', 'Pente': 'float64', 'Atténuation(dB)': 'float64', "Type d'évenements": 'category'
+}
+
+def typer_colonnes(df, types):
+    # Après concaténation, des catégories différentes d'un lot à l'autre redonnent du texte : retypage global
+    for col, type_col in types.items():
+        if col in df.columns and df[col].dtype != type_col:
+            if type_col == 'category' or str(type_col).startswith('Int'):
+                df[col] = df[col].astype(type_col)
+            else:
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype(type_col)
+    return df
+# Codes de type des événements (KeyEvents, 8 caractères à positions fixes, Telcordia SR-4731) :
+# 1er caractère réflexion (0 non réflectif, 1 réflectif, 2 saturé), 2e origine (F trouvé par l'OTDR,
+# A ajouté à la main, O hors plage, E fin de fibre), 3e-6e n° de repère, 7e-8e méthode de mesure de la perte.
+# Chaque table donne la longueur minimale du code, la position de la clé, celle du repère et le libellé par clé ;
+# les tables sont essayées dans l'ordre, celle d'un autre constructeur s'ajoute ici.
+TABLES_TYPES_EVENEMENTS = {
+    'telcordia': {
+        'longueur': 8,
+        'cle': (0, 2),
+        'repere': (2, 6),
+        'libelles': {
+            '0F': 'Epissure', '0A': 'Epissure', '0O': 'Epissure',
+            '1F': 'Connecteur', '1A': 'Connecteur', '1O': 'Connecteur',
+            '2F': 'Connecteur', '2A': 'Connecteur', '2O': 'Connecteur',
+            '0E': 'Fin de fibre', '1E': 'Fin de fibre', '2E': 'Fin de fibre',
+        },
+    },
+}
+
+@lru_cache(maxsize=4096)
+def decoder_type_evenement(code):
+    # Libellé du code, ou le code brut si aucune table ne le reconnaît (signalé par la règle types_evenements)
+    for table in TABLES_TYPES_EVENEMENTS.values():
+        # Code tronqué ('0F99') ou repère non numérique : structure à positions fixes non respectée
+        debut, fin = table['repere']
+        if len(code) < table['longueur'] or not code[debut:fin].isdigit():
+            continue
+        libelle = table['libelles'].get(code[slice(*table['cle'])])
+        if libelle is not None:
+            return libelle
+    return code
+
+def libelles_types_evenements():
+    return {libelle for table in TABLES_TYPES_EVENEMENTS.values() for libelle in table['libelles'].values()}
+
+def classer_types_evenements(types):
+    # Quelques codes distincts pour des milliers d'événements : chaque code est décodé une fois,
+    # la colonne est reconstruite en catégorie à partir des codes du factorize
+    codes, uniques = pd.factorize(types, use_na_sentinel=True)
+    libelles = [decoder_type_evenement(str(code)) for code in uniques]
+    codes_libelles, categories = pd.factorize(pd.Series(libelles, dtype=object))
+    # Code -1 (type absent) : reste absent
+    codes_libelles = np.append(codes_libelles, -1)
+    return pd.Series(pd.Categorical.from_codes(codes_libelles[codes], categories), index=types.index)
+
+TAILLE_LOT = 5000
+# A incrémenter dès que lignes_trace change la forme des lignes extraites : invalide le cache
+VERSION_EXTRACTION = 4
+VERSION_PARSEUR = f"pyotdr-{getattr(pyotdr, '__version__', 'cli')}/extraction-{VERSION_EXTRACTION}"
+TAILLE_MAX_CACHE = 256 * 1024 * 1024
+# Ouvertures de fichiers simultanées (listage des dossiers, empreintes du cache) : masque la latence des partages réseau
+LECTURES_SIMULTANEES = 8
+# Fichiers .sor confiés d'un coup à un worker de décodage
+FICHIERS_PAR_ENVOI = 16
+
+def nom_fichier_sor(sor_file):
+    return os.path.splitext(os.path.basename(sor_file))[0] + '.sor'
+
+def homonymes_sor(sor_files):
+    # Les lignes du rapport sont repérées par le seul nom de fichier : des .sor de même nom venus de dossiers
+    # différents (un par site en récursif) seraient confondus en une seule courbe
+    chemins = defaultdict(list)
+    for sor_file in sor_files:
+        chemins[nom_fichier_sor(sor_file)].append(sor_file)
+    return {nom: sorted(liste) for nom, liste in chemins.items() if len(liste) > 1}
+
+def decrire_homonymes(homonymes):
+    return ' ; '.join(
+        f"{nom} ({', '.join(os.path.dirname(chemin) for chemin in chemins)})" for nom, chemins in sorted(homonymes.items())
+    )
+
+def lignes_trace(data, fichier_sor):
+    nom_sor = data.get('filename', fichier_sor)
+    fxd_params = data.get('FxdParams', {})
+    gen_params = data.get('GenParams', {})
+    sup_params = data.get('SupParams', {})
+    key_events_summary = data.get('KeyEvents', {}).get('Summary', {})
+    params = {
+        'Fichier': fichier_sor,
+        'filename': nom_sor,
+        'loss end': key_events_summary.get('loss end', None),
+        **fxd_params,
+        **gen_params,
+        **sup_params
+    }
+    params = {cle: val for cle, val in params.items() if cle not in CHAMPS_PARAMS_ECARTES}
+    events = []
+    key_events = data.get('KeyEvents', {})
+    for key in key_events:
+        if key.lower().startswith('event '):
+            event_copy = {cle: val for cle, val in key_events[key].items() if cle not in CHAMPS_EVENTS_ECARTES}
+            event_copy['Fichier'] = fichier_sor
+            event_copy['filename'] = nom_sor
+            event_copy['Event ID'] = key.split()[1]
+            events.append(event_copy)
+    return params, events
+
+def extraire_trace(sor_file):
+    # Exécutée dans les workers : seules les lignes utiles et les niveaux de la trace repassent au processus principal
+    try:
+        results, tracedata = decoder_sor(sor_file)
+        return lignes_trace(results, nom_fichier_sor(sor_file)), echantillons_trace(tracedata), None
+    except Exception as e:
+        return None, None, str(e)
+
+def empreinte_sor(sor_file):
+    with open(sor_file, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+def empreintes_sor(sor_files, lectures=LECTURES_SIMULTANEES):
+    # Lectures recouvertes sur un pool de threads (la lecture et blake2b relâchent le GIL) : sur un partage SMB,
+    # la latence de chaque ouverture est payée en parallèle plutôt que fichier après fichier
+    def lire(sor_file):
+        try:
+            return empreinte_sor(sor_file)
+        except OSError as e:
+            print(f"⚠️ Lecture impossible de {os.path.basename(sor_file)} : {e}")
+            return None
+    with ThreadPoolExecutor(max_workers=max(1, lectures)) as pool:
+        return {
+            sor_file: empreinte for sor_file, empreinte in zip(sor_files, pool.map(lire, sor_files))
+            if empreinte is not None
+        }
+
+def renommer_trace(trace, sor_file):
+    # Le cache est indexé sur le contenu : un fichier renommé ou copié reprend ses propres noms
+    # (copie : plusieurs fichiers identiques partagent la même entrée lue dans le cache)
+    params, events = trace
+    noms = {'Fichier': nom_fichier_sor(sor_file), 'filename': os.path.basename(sor_file)}
+    return {**params, **noms}, [{**event, **noms} for event in events]
+
+def chemin_cache_defaut():
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ARGOS', 'cache_sor.sqlite')
+
+class CacheTraces:
+    # Cache local (SQLite) des lignes extraites de chaque .sor, indexé par empreinte du contenu ;
+    # une entrée n'est utilisable qu'une fois les métriques de sa trace enregistrées
+    def __init__(self, chemin, taille_max=TAILLE_MAX_CACHE, version=VERSION_PARSEUR):
+        os.makedirs(os.path.dirname(chemin) or '.', exist_ok=True)
+        self.version = version
+        self.taille_max = taille_max
+        self.a_ecrire = []
+        self.connexion = sqlite3.connect(chemin, timeout=30)
+        self.connexion.execute(
+            "CREATE TABLE IF NOT EXISTS traces ("
+            "empreinte TEXT PRIMARY KEY, version TEXT NOT NULL, taille INTEGER NOT NULL, "
+            "dernier_acces REAL NOT NULL, donnees TEXT NOT NULL, metriques TEXT)"
+        )
+        if 'metriques' not in [ligne[1] for ligne in self.connexion.execute("PRAGMA table_info(traces)")]:
+            self.connexion.execute("ALTER TABLE traces ADD COLUMN metriques TEXT")
+        self.connexion.execute("CREATE INDEX IF NOT EXISTS idx_traces_acces ON traces (dernier_acces)")
+        self.connexion.execute("DELETE FROM traces WHERE version != ?", (version,))
+        self.connexion.commit()
+
+    def lire(self, empreintes):
+        empreintes = list(empreintes)
+        trouvees = {}
+        for i in range(0, len(empreintes), 500):
+            lot = empreintes[i:i + 500]
+            lignes = self.connexion.execute(
+                f"SELECT empreinte, donnees, metriques FROM traces "
+                f"WHERE version = ? AND metriques IS NOT NULL AND empreinte IN ({','.join('?' * len(lot))})",
+                [self.version, *lot]
+            )
+            for empreinte, donnees, metriques in lignes:
+                params, events = json.loads(donnees)
+                trouvees[empreinte] = ({**params, **json.loads(metriques)}, events)
+        if trouvees:
+            maintenant = time.time()
+            self.connexion.executemany(
+                "UPDATE traces SET dernier_acces = ? WHERE empreinte = ?",
+                [(maintenant, empreinte) for empreinte in trouvees]
+            )
+            self.connexion.commit()
+        return trouvees
+
+    def ecrire(self, empreinte, trace, metriques=None):
+        donnees = json.dumps(trace, ensure_ascii=False)
+        metriques = None if metriques is None else json.dumps(metriques)
+        self.a_ecrire.append((empreinte, self.version, len(donnees), time.time(), donnees, metriques))
+        if len(self.a_ecrire) >= 500:
+            self.enregistrer()
+
+    def ecrire_metriques(self, metriques):
+        # metriques : [(empreinte, {colonne: valeur})], calculées après coup sur l'ensemble des traces
+        self.enregistrer()
+        self.connexion.executemany(
+            "UPDATE traces SET metriques = ? WHERE empreinte = ?",
+            [(json.dumps(valeurs), empreinte) for empreinte, valeurs in metriques]
+        )
+        self.connexion.commit()
+
+    def enregistrer(self):
+        if self.a_ecrire:
+            self.connexion.executemany(
+                "INSERT OR REPLACE INTO traces (empreinte, version, taille, dernier_acces, donnees, metriques) "
+                "VALUES (?, ?, ?, ?, ?, ?)", self.a_ecrire
+            )
+            self.a_ecrire = []
+        self.evincer()
+        self.connexion.commit()
+
+    def evincer(self):
+        # Au-delà de taille_max, on supprime les traces les moins récemment utilisées jusqu'à 90 % de la limite
+        total = self.connexion.execute("SELECT COALESCE(SUM(taille), 0) FROM traces").fetchone()[0]
+        if total <= self.taille_max:
+            return
+        a_liberer = total - int(self.taille_max * 0.9)
+        supprimees = []
+        for empreinte, taille in self.connexion.execute("SELECT empreinte, taille FROM traces ORDER BY dernier_acces").fetchall():
+            if a_liberer <= 0:
+                break
+            supprimees.append((empreinte,))
+            a_liberer -= taille
+        self.connexion.executemany("DELETE FROM traces WHERE empreinte = ?", supprimees)
+
+    def fermer(self):
+        self.enregistrer()
+        self.connexion.close()
+
+def ouvrir_cache(chemin=None):
+    try:
+        return CacheTraces(chemin or chemin_cache_defaut())
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Cache désactivé : {e}")
+        return None
+
+def decoder_en_parallele(sor_files, nb_workers=None, pool=None):
+    # Résultats (trace, échantillons, erreur) dans l'ordre de sor_files ; trace None => repli sur le CLI.
+    # Un pool fourni (service de surveillance) est réutilisé d'un lot à l'autre et reste ouvert.
+    if sorparse is None:
+        for _ in sor_files:
+            yield None, None, None
+        return
+    nb_traites = 0
+    nb_workers = nombre_workers(min(len(sor_files), nb_workers or len(sor_files)))
+    try:
+        with (ProcessPoolExecutor(max_workers=nb_workers) if pool is None else nullcontext(pool)) as executeur:
+            # Envois bornés : une annulation n'attend que les quelques fichiers déjà confiés à chaque worker
+            chunksize = max(1, min(FICHIERS_PAR_ENVOI, len(sor_files) // (nb_workers * 4)))
+            try:
+                for resultat in executeur.map(extraire_trace, sor_files, chunksize=chunksize):
+                    nb_traites += 1
+                    yield resultat
+            except GeneratorExit:
+                # Analyse interrompue (annulation) : les fichiers pas encore commencés ne sont pas décodés,
+                # seuls ceux en cours sont attendus
+                if pool is None:
+                    executeur.shutdown(cancel_futures=True)
+                raise
+    except BrokenProcessPool as e:
+        for _ in sor_files[nb_traites:]:
+            yield None, None, f"pool de décodage interrompu ({e})"
+
+def iterer_traces(sor_files, flags=0, cache=None, nb_workers=None, magasin=None, pool=None,
+                  lectures=LECTURES_SIMULTANEES):
+    # Les niveaux des traces décodées partent dans le magasin, repérés par leur rang dans les traces produites
+    sor_files = list(sor_files)
+    rang = 0
+    empreintes = {}
+    connues = {}
+    if cache is not None:
+        empreintes = empreintes_sor(sor_files, lectures)
+        connues = cache.lire(set(empreintes.values()))
+    a_decoder = [sor_file for sor_file in sor_files if empreintes.get(sor_file) not in connues]
+    decodees = decoder_en_parallele(a_decoder, nb_workers, pool) if a_decoder else iter(())
+    for sor_file in sor_files:
+        empreinte = empreintes.get(sor_file)
+        if empreinte in connues:
+            rang += 1
+            yield sor_file, renommer_trace(connues[empreinte], sor_file)
+            continue
+        trace, echantillons, erreur = next(decodees)
+        if trace is None:
+            if erreur:
+                print(f"⚠️ Décodage interne impossible pour {os.path.basename(sor_file)} : {erreur}")
+            try:
+                results, echantillons = convertir_sor_cli(sor_file, flags)
+                trace = lignes_trace(results, nom_fichier_sor(sor_file))
+            except Exception as e:
+                print(f"❌ Erreur sur {os.path.basename(sor_file)} : {e}")
+                yield sor_file, None
+                continue
+        if cache is not None and empreinte is not None:
+            # Sans échantillons, aucune métrique à attendre : l'entrée est complète tout de suite
+            cache.ecrire(empreinte, trace, {} if echantillons is None else None)
+        if echantillons is not None and magasin is not None:
+            magasin.ajouter(rang, echantillons, empreinte)
+        rang += 1
+        yield sor_file, trace
+
+def preparer_lot_params(all_params):
+    df_params = pd.DataFrame(all_params)
+    df_params = df_params.rename(columns={
+        'filename': 'MétaNommage',
+        'index': 'Indice de Réfraction',
+        'pulse width': 'Impulsion',
+        'range': 'Portée(km)',
+        'comments': 'Commentaire',
+        'operator': 'Technicien',
+        'software': 'Version',
+        'supplier': 'Fabricant',
+        'wavelength': 'Lambda',
+        'loss end': 'Distance Totale(km)'
+    }, errors='ignore')
+    if 'Indice de Réfraction' in df_params.columns:
+        df_params['Indice de Réfraction'] = df_params['Indice de Réfraction'].astype(str).apply(lambda x: x[:6])
+    if 'Distance Totale(km)' in df_params.columns:
+        df_params['Distance Totale(km)'] = pd.to_numeric(df_params['Distance Totale(km)'], errors='coerce').round(3)
+    if 'date/time' in df_params.columns:
+        df_params['date/time'] = lire_dates(df_params['date/time'])
+    if 'Portée(km)' in df_params.columns:
+        df_params['Portée(km)'] = pd.to_numeric(df_params['Portée(km)'], errors='coerce').round(0).astype('Int32')
+    return df_params
+
+def preparer_lot_events(all_events):
+    df_events = pd.DataFrame(all_events)
+    df_events = df_events.rename(columns={
+        'filename': 'MétaNommage',
+        'Event ID': 'N° évenement',
+        'refl loss': 'Réfléctance',
+        'distance': 'Distance',
+        'slope': 'Pente',
+        'splice loss': 'Atténuation(dB)',
+        'type': "Type d'évenements"
+    }, errors='ignore')
+    if "Type d'évenements" in df_events.columns:
+        df_events["Type d'évenements"] = classer_types_evenements(df_events["Type d'évenements"])
+    # Valeurs pyotdr en texte ("1.200", "-45.000") : converties ici, une fois, plutôt qu'à chaque contrôle
+    for col in ('N° évenement', 'Distance', 'Réfléctance', 'Pente', 'Atténuation(dB)'):
+        if col in df_events.columns:
+            df_events[col] = pd.to_numeric(df_events[col], errors='coerce').astype(TYPES_EVENTS[col])
+    return df_events
+
+def construire_dataframes(traces, taille_lot=TAILLE_LOT):
+    # Les dicts bruts sont convertis par lots : seul un lot de dicts est en mémoire à la fois
+    lots_params, lots_events = [], []
+    all_params, all_events = [], []
+    for params, events in traces:
+        all_params.append(params)
+        all_events.extend(events)
+        if len(all_params) >= taille_lot:
+            lots_params.append(preparer_lot_params(all_params))
+            all_params = []
+        if len(all_events) >= taille_lot:
+            lots_events.append(preparer_lot_events(all_events))
+            all_events = []
+    if all_params or not lots_params:
+        lots_params.append(preparer_lot_params(all_params))
+    if all_events or not lots_events:
+        lots_events.append(preparer_lot_events(all_events))
+    return (
+        typer_colonnes(pd.concat(lots_params, ignore_index=True), TYPES_PARAMS),
+        typer_colonnes(pd.concat(lots_events, ignore_index=True), TYPES_EVENTS)
+    )
+
+# Métriques calculées sur les niveaux bruts des traces, par blocs de traces tenant dans BUDGET_TRACES
+COLONNES_METRIQUES = ['Pente(dB/km)', 'Bruit(dB)', 'Dynamique(dB)', 'Marches non signalées']
+BUDGET_TRACES = 64 * 1024 * 1024
+# Octets de travail par échantillon dans un bloc (niveaux, abscisses, masques, cumuls, fenêtres...)
+OCTETS_PAR_ECHANTILLON = 160
+FENETRE_MARCHE_KM = 0.05
+SEUIL_MARCHE_DB = 0.15
+
+class MagasinTraces:
+    # Niveaux (float32) des traces décodées, empilés dans un fichier temporaire et relus en mémoire mappée :
+    # seul le bloc en cours de calcul est chargé en mémoire
+    def __init__(self, dossier=None):
+        fd, self.chemin = tempfile.mkstemp(prefix='argos_traces_', suffix='.f32', dir=dossier)
+        self.fichier = os.fdopen(fd, 'wb')
+        self.rangs, self.debuts, self.longueurs, self.pas, self.empreintes = [], [], [], [], []
+        self.taille = 0
+
+    def ajouter(self, rang, echantillons, empreinte=None):
+        pas, niveaux = echantillons
+        niveaux = np.ascontiguousarray(niveaux, dtype=np.float32)
+        self.fichier.write(niveaux.tobytes())
+        self.rangs.append(rang)
+        self.debuts.append(self.taille)
+        self.longueurs.append(len(niveaux))
+        self.pas.append(pas)
+        self.empreintes.append(empreinte)
+        self.taille += len(niveaux)
+
+    def niveaux(self):
+        self.fichier.flush()
+        if not self.taille:
+            return np.empty(0, dtype=np.float32)
+        return np.memmap(self.chemin, dtype=np.float32, mode='r', shape=(self.taille,))
+
+    def fermer(self):
+        self.fichier.close()
+        try:
+            os.remove(self.chemin)
+        except OSError:
+            pass
+
+def blocs_traces(longueurs, budget=BUDGET_TRACES):
+    # Découpe les traces consécutives en blocs (debut, fin) dont la matrice de travail reste sous le budget
+    blocs = []
+    debut, longueur_max = 0, 0
+    for k, longueur in enumerate(longueurs):
+        longueur_max_bloc = max(longueur_max, longueur)
+        if k > debut and (k - debut + 1) * longueur_max_bloc * OCTETS_PAR_ECHANTILLON > budget:
+            blocs.append((debut, k))
+            debut, longueur_max_bloc = k, longueur
+        longueur_max = longueur_max_bloc
+    if debut < len(longueurs):
+        blocs.append((debut, len(longueurs)))
+    return blocs
+
+def metriques_bloc(niveaux, pas, fins_km, evenements_km):
+    # niveaux : matrice (traces x échantillons) complétée par des NaN ; evenements_km : idem pour les distances
+    # des événements déclarés. Tous les calculs sont faits sur le bloc entier.
+    nb, longueur = niveaux.shape
+    abscisses = np.arange(longueur)[None, :] * pas[:, None]
+    valides = ~np.isnan(niveaux)
+    fins = np.where(np.isnan(fins_km), (valides.sum(axis=1) - 1) * pas, fins_km)
+    zone = valides & (abscisses >= 0.05 * fins[:, None]) & (abscisses <= 0.95 * fins[:, None])
+    y = np.where(zone, niveaux, 0.0)
+    # Moyennes glissantes avant/après chaque échantillon (fenêtre de FENETRE_MARCHE_KM), via sommes cumulées
+    fenetre = np.clip(np.rint(FENETRE_MARCHE_KM / np.where(pas > 0, pas, np.inf)), 3, max(3, longueur // 4)).astype(int)
+    cumul = np.zeros((nb, longueur + 1))
+    np.cumsum(y, axis=1, out=cumul[:, 1:])
+    comptes = np.zeros((nb, longueur + 1))
+    np.cumsum(zone, axis=1, out=comptes[:, 1:])
+    positions = np.arange(longueur + 1)[None, :]
+    avant = np.clip(positions - fenetre[:, None], 0, longueur)
+    apres = np.clip(positions + fenetre[:, None], 0, longueur)
+    completes = (
+        (comptes - np.take_along_axis(comptes, avant, axis=1) == fenetre[:, None]) &
+        (np.take_along_axis(comptes, apres, axis=1) - comptes == fenetre[:, None])
+    )
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        # Traces trop courtes ou sans zone de bruit : NaN, sans avertissement "All-NaN slice"
+        warnings.simplefilter('ignore', RuntimeWarning)
+        chute = np.where(
+            completes,
+            ((cumul - np.take_along_axis(cumul, avant, axis=1)) -
+             (np.take_along_axis(cumul, apres, axis=1) - cumul)) / fenetre[:, None],
+            np.nan
+        )
+        # Pente de la fibre : médiane des pentes locales sur les sections entre événements déclarés,
+        # insensible aux marches non déclarées
+        bornes_km = positions * pas[:, None]
+        hors_evenements = np.ones_like(completes)
+        for distances in evenements_km.T:
+            hors_evenements &= ~(np.abs(bornes_km - distances[:, None]) <= (fenetre * pas)[:, None])
+        pente = np.nanmedian(np.where(hors_evenements, chute, np.nan), axis=1) / (fenetre * pas)
+        # Niveau à l'origine : médiane du début de fibre (15 %) ramené à x = 0
+        debut_fibre = zone & (abscisses <= 0.15 * fins[:, None])
+        origine = np.nanmedian(np.where(debut_fibre, niveaux + pente[:, None] * abscisses, np.nan), axis=1)
+        # Plancher de bruit : niveau moyen au-delà de la fin de fibre (marge de 5 %, au moins 100 m)
+        zone_bruit = valides & (abscisses > (fins + np.maximum(0.05 * fins, 0.1))[:, None])
+        nb_bruit = zone_bruit.sum(axis=1)
+        bruit = np.where(nb_bruit >= 10, np.where(zone_bruit, niveaux, 0.0).sum(axis=1) / nb_bruit, np.nan)
+    dynamique = origine - bruit
+    # Marches : chute entre fenêtres, pente retirée ; les maxima locaux au-delà du seuil loin de tout
+    # événement déclaré sont comptés
+    marche = np.where(completes, chute - (pente * fenetre * pas)[:, None], -np.inf)
+    voisins = np.pad(marche, ((0, 0), (1, 1)), constant_values=-np.inf)
+    lignes, colonnes = np.nonzero(
+        (marche >= SEUIL_MARCHE_DB) & (marche >= voisins[:, :-2]) & (marche > voisins[:, 2:])
+    )
+    # Un seul pic par marche : les candidats plus proches qu'une fenêtre sont regroupés sur le plus haut
+    if len(lignes):
+        nouveaux = np.ones(len(lignes), dtype=bool)
+        nouveaux[1:] = (lignes[1:] != lignes[:-1]) | (colonnes[1:] - colonnes[:-1] >= fenetre[lignes[1:]])
+        debuts = np.flatnonzero(nouveaux)
+        hauteurs = marche[lignes, colonnes]
+        meilleurs = debuts + np.array([np.argmax(h) for h in np.split(hauteurs, debuts[1:])], dtype=int)
+        lignes, colonnes = lignes[meilleurs], colonnes[meilleurs]
+    distances = colonnes * pas[lignes]
+    tolerance = 0.5 * fenetre[lignes] * pas[lignes]
+    with np.errstate(invalid='ignore'):
+        proches = np.abs(evenements_km[lignes] - distances[:, None]) <= tolerance[:, None]
+    marches = np.bincount(lignes[~proches.any(axis=1)], minlength=nb)
+    return pente, bruit, dynamique, marches
+
+def metriques_traces(magasin, fins_km, evenements_km, budget=BUDGET_TRACES):
+    # Une ligne par trace du magasin (dans l'ordre d'ajout) ; fins_km et evenements_km suivent le même ordre.
+    # Les blocs regroupent des traces de longueurs voisines pour limiter le remplissage par des NaN.
+    niveaux = magasin.niveaux()
+    ordre = np.argsort(magasin.longueurs, kind='stable')
+    longueurs = np.asarray(magasin.longueurs)[ordre]
+    resultats = {col: np.full(len(magasin.rangs), np.nan) for col in COLONNES_METRIQUES}
+    for debut, fin in blocs_traces(longueurs, budget):
+        traces = ordre[debut:fin]
+        bloc = np.full((len(traces), longueurs[fin - 1]), np.nan)
+        for k, trace in enumerate(traces):
+            position, longueur = magasin.debuts[trace], magasin.longueurs[trace]
+            bloc[k, :longueur] = niveaux[position:position + longueur]
+        evenements = [evenements_km[trace] for trace in traces]
+        matrice_evenements = np.full((len(traces), max([len(e) for e in evenements] + [1])), np.nan)
+        for k, distances in enumerate(evenements):
+            matrice_evenements[k, :len(distances)] = distances
+        valeurs = metriques_bloc(
+            bloc, np.asarray(magasin.pas, dtype=float)[traces], np.asarray(fins_km, dtype=float)[traces],
+            matrice_evenements
+        )
+        for col, valeur in zip(COLONNES_METRIQUES, valeurs):
+            resultats[col][traces] = valeur
+    del niveaux
+    df_metriques = pd.DataFrame(resultats)
+    for col in ['Pente(dB/km)', 'Bruit(dB)', 'Dynamique(dB)']:
+        df_metriques[col] = df_metriques[col].round(4)
+    return df_metriques
+
+def ajouter_metriques(df_params, df_events, magasin, cache=None, budget=BUDGET_TRACES):
+    # Les traces lues dans le cache apportent déjà leurs métriques ; celles du magasin sont calculées ici
+    for col in COLONNES_METRIQUES:
+        if col not in df_params.columns:
+            df_params[col] = np.nan
+    if magasin is not None and magasin.rangs:
+        lignes = df_params.iloc[magasin.rangs]
+        fins = pd.to_numeric(colonne(lignes, 'Distance Totale(km)', np.nan), errors='coerce').to_numpy(dtype=float)
+        distances = {}
+        if 'Distance' in df_events.columns:
+            distances_evenements = pd.to_numeric(df_events['Distance'], errors='coerce')
+            distances = {
+                fichier: groupe.dropna().to_numpy(dtype=float)
+                for fichier, groupe in distances_evenements.groupby(df_events['Fichier'], sort=False, observed=True)
+            }
+        evenements = [distances.get(fichier, np.empty(0)) for fichier in colonne(lignes, 'Fichier')]
+        df_metriques = metriques_traces(magasin, fins, evenements, budget)
+        for col in COLONNES_METRIQUES:
+            df_params.loc[lignes.index, col] = df_metriques[col].to_numpy()
+        if cache is not None:
+            cache.ecrire_metriques([
+                (empreinte, {col: (None if pd.isna(valeur) else float(valeur)) for col, valeur in metriques.items()})
+                for empreinte, metriques in zip(magasin.empreintes, df_metriques.to_dict('records'))
+                if empreinte is not None
+            ])
+    df_params['Marches non signalées'] = pd.to_numeric(df_params['Marches non signalées'], errors='coerce').astype('Int64')
+    return df_params
+
+def normaliser_lambda(val):
+    return str(val).lower().replace('nm', '').replace(' ', '').replace('\xa0', '')
+
+def lire_indice(val):
+    try:
+        return round(float(str(val).replace(',', '.').strip()), 4)
+    except Exception:
+        # Indice illisible : toujours hors tolérance (un 'nan' lisible, lui, ne l'est jamais)
+        return float('inf')
+
+def par_valeur(serie, fonction):
+    # Lambda, indice, impulsion... ne prennent que quelques valeurs distinctes :
+    # la fonction n'est évaluée qu'une fois par valeur puis diffusée sur la colonne
+    codes, uniques = pd.factorize(serie, use_na_sentinel=False)
+    valeurs = np.empty(len(uniques), dtype=object)
+    valeurs[:] = [fonction(val) for val in uniques]
+    return pd.Series(valeurs[codes], index=serie.index)
+
+def colonne(df, nom, defaut=''):
+    if nom in df.columns:
+        return df[nom]
+    return pd.Series(defaut, index=df.index, dtype=object)
+
+def lignes_anomalies(df, masque, colonnes, anomalie):
+    # Equivalent colonne par colonne des dicts {col: row.get(col, '')} construits ligne à ligne
+    selection = df.loc[np.asarray(masque, dtype=bool)]
+    df_anomalies = pd.DataFrame({col: colonne(selection, col) for col in colonnes}, index=selection.index)
+    df_anomalies['Anomalie'] = anomalie
+    return df_anomalies
+
+# Registre des règles de contrôle : chaque règle déclare la table lue, les colonnes indispensables,
+# les colonnes dérivées partagées qu'elle consomme, ses seuils par défaut (surchargeables par projet)
+# et la colonne qui borne ses comparaisons entre courbes (groupe : une courbe seule par défaut).
+# partitionnable : anomalies rendues groupe après groupe dans l'ordre trié des clés, la règle peut donc être
+# exécutée par tranches de groupes consécutifs dont les résultats sont mis bout à bout
+REGLES = {}
+
+def regle(nom, libelle, table='parametres', colonnes=(), derivees=(), message=None, groupe='Fichier',
+          partitionnable=False, **parametres):
+    def enregistrer(fonction):
+        REGLES[nom] = {
+            'fonction': fonction, 'libelle': libelle, 'table': table, 'colonnes': list(colonnes),
+            'derivees': list(derivees), 'message': message, 'groupe': groupe, 'partitionnable': partitionnable,
+            'parametres': parametres
+        }
+        return fonction
+    return enregistrer
+
+# Colonnes dérivées calculées une seule fois pour toutes les règles qui les demandent
+DERIVEES = {
+    'lambda': lambda df: par_valeur(colonne(df, 'Lambda'), normaliser_lambda),
+    'indice': lambda df: par_valeur(colonne(df, 'Indice de Réfraction'), lire_indice).astype(float),
+    'indice_normalise': lambda df: par_valeur(colonne(df, 'Indice de Réfraction'), normaliser_indice),
+    'impulsion': lambda df: par_valeur(colonne(df, 'Impulsion'), extraire_chiffres),
+}
+
+def nom_base(nom):
+    return re.sub(r'(_\d+)?\.sor$', '.sor', str(nom), flags=re.IGNORECASE)
+
+def normaliser_colonnes(df_params):
+    # Conversions reprises telles quelles dans le rapport (distance numérique, câble nettoyé, dates lues, NomBase)
+    if 'Distance Totale(km)' in df_params.columns:
+        df_params['Distance Totale(km)'] = pd.to_numeric(df_params['Distance Totale(km)'], errors='coerce')
+    if 'cable ID' in df_params.columns:
+        df_params['cable ID'] = df_params['cable ID'].astype(str).str.strip().astype('category')
+    if 'date/time' in df_params.columns:
+        df_params['date/time'] = pd.to_datetime(df_params['date/time'], errors='coerce', dayfirst=True)
+    df_params['NomBase'] = colonne(df_params, 'Fichier').apply(nom_base)
+    return df_params
+
+@regle('epissures', "Contrôle des épissures...", table='evenements',
+       colonnes=["Type d'évenements", 'Atténuation(dB)'], seuil_db=0.3, moyenne_bidirectionnelle=True)
+def regle_epissures(df_events, derivees, seuil_db=0.3, moyenne_bidirectionnelle=True):
+    pertes = pd.to_numeric(df_events["Atténuation(dB)"], errors='coerce')
+    if moyenne_bidirectionnelle and 'Atténuation bidir.(dB)' in df_events.columns:
+        # Epissure alignée avec l'autre sens : la moyenne des deux sens remplace la perte d'un seul sens
+        pertes = df_events['Atténuation bidir.(dB)'].fillna(pertes)
+    df_anomalies = df_events[
+        (df_events["Type d'évenements"] == "Epissure") & (pertes >= seuil_db)
+    ].copy()
+    df_anomalies['Anomalie'] = "Epissure NOK"
+    return df_anomalies
+
+@regle('lambda_indice', "Contrôle Lambda/Indice de Réfraction...", derivees=['lambda', 'indice'],
+       indices={'1310': 1.4675, '1550': 1.4680}, tolerance=0.0001)
+def regle_lambda_indice(df_params, derivees, indices=None, tolerance=0.0001):
+    masque = pd.Series(False, index=df_params.index)
+    for lambda_nm, indice_ref in (indices or {}).items():
+        masque |= (derivees['lambda'] == str(lambda_nm)) & ((derivees['indice'] - float(indice_ref)).abs() > tolerance)
+    return lignes_anomalies(
+        df_params, masque,
+        ['Fichier', 'MétaNommage', 'Indice de Réfraction', 'Impulsion', 'Lambda'],
+        "Indice de Réfraction NOK"
+    ).reset_index(drop=True)
+
+@regle('longueur_fibres', "Contrôle longueurs fibres (même boîte)...", colonnes=['cable ID', 'Distance Totale(km)'],
+       groupe='cable ID', partitionnable=True, tolerance_m=30)
+def regle_longueur_fibres(df_params, derivees, tolerance_m=30):
+    # Toutes les mesures d'un câble sont signalées dès que ses longueurs connues s'écartent de plus de la tolérance
+    cables = df_params['cable ID']
+    distances = df_params.groupby(cables, sort=False, observed=True)['Distance Totale(km)']
+    ecart = distances.transform('max') - distances.transform('min')
+    masque = (cables != '') & (distances.transform('count') >= 2) & (ecart > tolerance_m / 1000.0)
+    selection = df_params[masque].sort_values('cable ID', kind='stable')
+    return lignes_anomalies(
+        selection, np.ones(len(selection), dtype=bool),
+        ['Fichier', 'MétaNommage', 'Indice de Réfraction', 'Impulsion', 'Lambda', 'cable ID', 'Distance Totale(km)'],
+        "Longueurs d'une même fibres NOK"
+    ).reset_index(drop=True)
+
+@regle('parametres', "Contrôle des autres paramètres...", derivees=['indice_normalise', 'impulsion'],
+       message=("Contrôle terminé", "{} anomalies paramètre ajoutées dans 'Hors Normes'."),
+       indice_ref="1.4675", impulsion_ref="30")
+def regle_parametres(df_params, derivees, indice_ref="1.4675", impulsion_ref="30"):
+    colonnes = ['Fichier', 'MétaNommage', 'Indice de Réfraction', 'Impulsion']
+    anomalies_indice = lignes_anomalies(
+        df_params, derivees['indice_normalise'] != normaliser_indice(indice_ref), colonnes, "Indice de Réfraction NOK"
+    )
+    anomalies_impulsion = lignes_anomalies(
+        df_params, derivees['impulsion'] != extraire_chiffres(impulsion_ref), colonnes, "Impulsion NOK"
+    )
+    # Tri stable sur l'index : pour une même ligne, l'anomalie d'indice précède celle d'impulsion
+    return pd.concat([anomalies_indice, anomalies_impulsion]).sort_index(kind='stable').reset_index(drop=True)
+
+@regle('temps_mesures', "Analyse temporelle des fichiers...", colonnes=['date/time'], derivees=['lambda'],
+       groupe='NomBase', partitionnable=True, ecart_min_s=90)
+def regle_temps_mesures(df_params, derivees, ecart_min_s=90):
+    # Mesures d'une même courbe (NomBase) triées par date : deux mesures consécutives de même lambda
+    # espacées de moins de ecart_min_s sont signalées toutes les deux
+    dates = df_params['date/time'].reset_index(drop=True)
+    instants = dates.to_numpy(dtype='datetime64[ns]').view('i8')
+    manquantes = dates.isna().to_numpy()
+    groupes, _ = pd.factorize(df_params['NomBase'], sort=True)
+    ordre = np.lexsort((np.where(manquantes, np.iinfo(np.int64).max, instants), groupes))
+    # Dates égales dans une courbe : même ordre que le tri pandas de l'ancien contrôle, groupe par groupe
+    egales = (groupes[ordre][1:] == groupes[ordre][:-1]) & (instants[ordre][1:] == instants[ordre][:-1]) & ~manquantes[ordre][1:]
+    for groupe in np.unique(groupes[ordre][1:][egales]):
+        segment = np.flatnonzero(groupes[ordre] == groupe)
+        positions = np.sort(ordre[segment])
+        ordre[segment] = positions[dates.iloc[positions].reset_index(drop=True).sort_values().index.to_numpy()]
+    lambdas = derivees['lambda'].to_numpy()[ordre]
+    valides = ~manquantes[ordre]
+    paires = np.flatnonzero(
+        (groupes[ordre][1:] == groupes[ordre][:-1]) & valides[1:] & valides[:-1] & (lambdas[1:] == lambdas[:-1]) &
+        (np.diff(instants[ordre]) < int(ecart_min_s * 1e9))
+    )
+    lignes = np.column_stack([ordre[paires], ordre[paires + 1]]).ravel()
+    selection = df_params.iloc[lignes]
+    df_anomalies = lignes_anomalies(
+        selection, np.ones(len(selection), dtype=bool),
+        ['Fichier', 'MétaNommage', 'Indice de Réfraction', 'Impulsion', 'Lambda'],
+        "Temps de mesures <1min 30"
+    )
+    if 'MétaNommage' not in df_params.columns:
+        df_anomalies['MétaNommage'] = selection['Fichier']
+    return df_anomalies.reset_index(drop=True)
+
+@regle('doublons', "Analyse des courbes en doublons...", colonnes=['date/time'], derivees=['lambda'],
+       message=("Analyse doublons", "{} courbes en doublons détectées."), groupe='NomBase', partitionnable=True)
+def regle_doublons(df_params, derivees):
+    candidats = df_params[df_params['date/time'].notnull()]
+    # Deux courbes ne peuvent former un doublon que si elles partagent NomBase, Lambda et date/time :
+    # les lignes seules dans leur clé sont écartées d'emblée, les autres sont indexées par clé
+    cles = [candidats['NomBase'], derivees['lambda'][candidats.index], candidats['date/time']]
+    multiples = candidats.groupby(cles, sort=False)['NomBase'].transform('size').to_numpy() > 1
+    candidats = candidats[multiples]
+    id_cles = candidats.groupby([cle[multiples] for cle in cles], sort=False).ngroup().to_numpy()
+    nom_bases = candidats['NomBase'].to_numpy()
+    fichiers = colonne(candidats, 'Fichier').to_numpy()
+    # Parcours dans l'ordre de l'ancienne double boucle (NomBase trié, puis ordre des lignes) :
+    # chaque courbe est appariée à la première suivante de même clé dont le fichier n'est pas déjà signalé
+    ordre = np.argsort(nom_bases, kind='stable')
+    en_attente = defaultdict(deque)
+    for k, pos in enumerate(ordre):
+        en_attente[id_cles[pos]].append(k)
+    fichiers_traites = set()
+    lignes = []
+    for k, pos in enumerate(ordre):
+        if (nom_bases[pos], fichiers[pos]) in fichiers_traites:
+            continue
+        file = en_attente[id_cles[pos]]
+        while file and (file[0] <= k or (nom_bases[ordre[file[0]]], fichiers[ordre[file[0]]]) in fichiers_traites):
+            file.popleft()
+        if file:
+            autre = ordre[file.popleft()]
+            lignes += [pos, autre]
+            fichiers_traites.add((nom_bases[pos], fichiers[pos]))
+            fichiers_traites.add((nom_bases[autre], fichiers[autre]))
+    doublons = candidats.iloc[lignes]
+    return lignes_anomalies(
+        doublons, np.ones(len(doublons), dtype=bool),
+        ['Fichier', 'MétaNommage', 'Indice de Réfraction', 'Impulsion', 'Lambda', 'date/time'],
+        "Courbes en doublons"
+    ).reset_index(drop=True)
+
+@regle('pente_fibre', "Contrôle de l'atténuation linéique des traces...", colonnes=['Pente(dB/km)'],
+       derivees=['lambda'], pentes_max={'1310': 0.40, '1550': 0.30})
+def regle_pente_fibre(df_params, derivees, pentes_max=None):
+    pentes = pd.to_numeric(df_params['Pente(dB/km)'], errors='coerce')
+    masque = pd.Series(False, index=df_params.index)
+    for lambda_nm, pente_max in (pentes_max or {}).items():
+        masque |= (derivees['lambda'] == str(lambda_nm)) & (pentes > float(pente_max))
+    return lignes_anomalies(
+        df_params, masque,
+        ['Fichier', 'MétaNommage', 'Lambda', 'Distance Totale(km)', 'Pente(dB/km)'],
+        "Atténuation linéique NOK"
+    ).reset_index(drop=True)
+
+@regle('dynamique', "Contrôle de la dynamique des traces...", colonnes=['Dynamique(dB)'], dynamique_min_db=5.0)
+def regle_dynamique(df_params, derivees, dynamique_min_db=5.0):
+    masque = pd.to_numeric(df_params['Dynamique(dB)'], errors='coerce') < float(dynamique_min_db)
+    return lignes_anomalies(
+        df_params, masque,
+        ['Fichier', 'MétaNommage', 'Lambda', 'Impulsion', 'Bruit(dB)', 'Dynamique(dB)'],
+        "Dynamique insuffisante"
+    ).reset_index(drop=True)
+
+@regle('marches', "Recherche d'épissures non déclarées sur les traces...", colonnes=['Marches non signalées'],
+       marches_max=0)
+def regle_marches(df_params, derivees, marches_max=0):
+    masque = pd.to_numeric(df_params['Marches non signalées'], errors='coerce') > marches_max
+    return lignes_anomalies(
+        df_params, masque.fillna(False),
+        ['Fichier', 'MétaNommage', 'Lambda', 'Marches non signalées'],
+        "Epissure non signalée"
+    ).reset_index(drop=True)
+
+@regle('mesure_opposee', "Contrôle des mesures bidirectionnelles...", colonnes=['Sens', 'Fichier opposé'],
+       groupe='cable ID')
+def regle_mesure_opposee(df_params, derivees):
+    # Seuls les câbles mesurés dans les deux sens (au moins une paire trouvée) sont concernés
+    cables = colonne(df_params, 'cable ID')
+    bidirectionnels = cables[df_params['Fichier opposé'] != ''].unique()
+    masque = (df_params['Sens'] != '') & (df_params['Fichier opposé'] == '') & cables.isin(bidirectionnels)
+    return lignes_anomalies(
+        df_params, masque,
+        ['Fichier', 'MétaNommage', 'Lambda', 'cable ID', 'fiber ID', 'Sens'],
+        "Mesure sens opposé manquante"
+    ).reset_index(drop=True)
+
+@regle('epissures_non_appariees', "Alignement des épissures entre les deux sens...", table='evenements',
+       colonnes=["Type d'évenements", 'Fichier opposé', 'Atténuation bidir.(dB)'])
+def regle_epissures_non_appariees(df_events, derivees):
+    masque = (
+        (df_events["Type d'évenements"] == "Epissure") & (df_events['Fichier opposé'] != '') &
+        df_events['Atténuation bidir.(dB)'].isna()
+    )
+    return lignes_anomalies(
+        df_events, masque,
+        ['Fichier', 'MétaNommage', 'N° évenement', 'Distance', 'Atténuation(dB)', 'Fichier opposé'],
+        "Epissure non appariée"
+    ).reset_index(drop=True)
+
+@regle('types_evenements', "Contrôle des types d'événements...", table='evenements', colonnes=["Type d'évenements"])
+def regle_types_evenements(df_events, derivees):
+    # Code qu'aucune table de TABLES_TYPES_EVENEMENTS ne reconnaît : l'événement n'entre dans aucun contrôle
+    types = df_events["Type d'évenements"]
+    masque = types.notna() & ~types.isin(libelles_types_evenements())
+    return lignes_anomalies(
+        df_events, masque,
+        ['Fichier', 'MétaNommage', 'N° évenement', 'Distance', "Type d'évenements"],
+        "Type d'événement inconnu"
+    ).reset_index(drop=True)
+
+@regle('nommage', "Vérification du nommage des courbes...",
+       message=("Analyse nommage", "{} erreurs de nommage détectées."))
+def regle_nommage(df_params, derivees):
+    noms_fichier = colonne(df_params, 'Fichier').map(lambda nom: os.path.splitext(nom)[0].lower())
+    metanommages = colonne(df_params, 'MétaNommage').map(str)
+    noms_metanommage = metanommages.map(lambda meta: os.path.splitext(meta)[0] if meta else '')
+    masque = (noms_fichier != noms_metanommage.str.lower()) & (noms_metanommage != '')
+    return lignes_anomalies(
+        df_params, masque,
+        ['Fichier', 'MétaNommage', 'Indice de Réfraction', 'Impulsion'],
+        "Nommage courbes incorrect"
+    ).reset_index(drop=True)
+
+class Suivi:
+    # Interface de suivi du traitement : sans effet par défaut, spécialisée pour la console et pour Tk
+    def debut(self, total):
+        pass
+
+    def etape(self, texte):
+        pass
+
+    def avancer(self, pas=1):
+        pass
+
+    def info(self, titre, message):
+        pass
+
+    def anomalies(self, df):
+        # Anomalies d'une règle, dès qu'elle est terminée
+        pass
+
+class AnalyseAnnulee(Exception):
+    pass
+
+class SuiviConsole(Suivi):
+    def __init__(self, prefixe=""):
+        self.prefixe = prefixe
+
+    def etape(self, texte):
+        if not texte.startswith("Conversion : "):
+            print(f"{self.prefixe}{texte}", flush=True)
+
+    def info(self, titre, message):
+        print(f"{self.prefixe}{titre} : {message}", flush=True)
+
+APERCU_ANOMALIES = 200
+
+class SuiviTk(Suivi):
+    # Appelé depuis le thread d'analyse : aucun widget n'est touché ici, les événements partent dans une file
+    # relue par la boucle Tk. Une annulation demandée par la fenêtre interrompt l'analyse à l'étape suivante.
+    def __init__(self, file, annulation):
+        self.file = file
+        self.annulation = annulation
+
+    def verifier(self):
+        if self.annulation.is_set():
+            raise AnalyseAnnulee()
+
+    def debut(self, total):
+        self.file.put(('debut', total))
+
+    def etape(self, texte):
+        self.verifier()
+        self.file.put(('etape', texte))
+
+    def avancer(self, pas=1):
+        self.verifier()
+        self.file.put(('avancer', pas))
+
+    def info(self, titre, message):
+        self.file.put(('info', f"{titre} : {message}"))
+
+    def anomalies(self, df):
+        # Aperçu mis en forme ici plutôt que dans la boucle Tk : (anomalie, nombre, [(fichier, détail)])
+        if df.empty or 'Anomalie' not in df.columns:
+            return
+        for anomalie, lignes in df.groupby('Anomalie', sort=False):
+            details = lignes.drop(columns=['Fichier', 'MétaNommage', 'Anomalie'], errors='ignore').head(APERCU_ANOMALIES)
+            apercu = [
+                (fichier, ' | '.join(f"{col} : {val}" for col, val in detail.items() if not pd.isna(val) and val != ''))
+                for fichier, (_, detail) in zip(colonne(lignes, 'Fichier').head(APERCU_ANOMALIES), details.iterrows())
+            ]
+            self.file.put(('anomalies', anomalie, len(lignes), apercu))
+
+FEUILLES_RAPPORT = {
+    'Parametres OTDR': 'parametres',
+    'Evenements': 'evenements',
+    'Hors Normes': 'hors_normes'
+}
+FORMATS_SORTIE = ('xlsx', 'csv', 'parquet')
+
+def largeurs_colonnes(df):
+    # Largeur = plus longue valeur affichée (en-tête compris) + 2, calculée sur le DataFrame
+    # plutôt qu'en relisant chaque cellule du classeur écrit
+    largeurs = []
+    for col in df.columns:
+        valeurs = df[col][df[col].notna()]
+        longueur = int(valeurs.astype(str).str.len().max()) if len(valeurs) else 0
+        largeurs.append(min(max(len(str(col)), longueur) + 2, 255))
+    return largeurs
+
+def exporter_excel(excel_output_path, df_params, df_events, df_hors_normes):
+    if XLSXWRITER:
+        writer = pd.ExcelWriter(
+            excel_output_path, engine='xlsxwriter',
+            engine_kwargs={'options': {'strings_to_formulas': False, 'strings_to_urls': False}}
+        )
+    else:
+        writer = pd.ExcelWriter(excel_output_path, engine='openpyxl')
+    with writer:
+        for nom_feuille, df in zip(FEUILLES_RAPPORT, (df_params, df_events, df_hors_normes)):
+            df.to_excel(writer, sheet_name=nom_feuille, index=False)
+            ws = writer.sheets[nom_feuille]
+            for i, largeur in enumerate(largeurs_colonnes(df)):
+                if XLSXWRITER:
+                    ws.set_column(i, i, largeur)
+                else:
+                    from openpyxl.utils import get_column_letter
+                    ws.column_dimensions[get_column_letter(i + 1)].width = largeur
+
+def preparer_parquet(df):
+    # Les colonnes object mélangent "" et nombres après les concat de 'Hors Normes' : Arrow exige un type unique
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+def chemins_rapport(chemin_sortie, format_sortie='xlsx'):
+    if format_sortie == 'xlsx':
+        return [chemin_sortie]
+    base = os.path.splitext(chemin_sortie)[0]
+    return [f"{base}_{suffixe}.{format_sortie}" for suffixe in FEUILLES_RAPPORT.values()]
+
+def exporter_rapport(chemin_sortie, df_params, df_events, df_hors_normes, format_sortie='xlsx'):
+    if format_sortie == 'xlsx':
+        exporter_excel(chemin_sortie, df_params, df_events, df_hors_normes)
+        return
+    for chemin, df in zip(chemins_rapport(chemin_sortie, format_sortie), (df_params, df_events, df_hors_normes)):
+        if format_sortie == 'parquet':
+            preparer_parquet(df).to_parquet(chemin, index=False)
+        else:
+            df.to_csv(chemin, index=False, encoding='utf-8')
+
+# Période des relevés de mémoire pendant une étape profilée
+INTERVALLE_RSS_S = 0.05
+
+def pids_enfants_linux():
+    pids = []
+    for tache in glob.glob('/proc/self/task/*/children'):
+        try:
+            with open(tache) as f:
+                pids += f.read().split()
+        except OSError:
+            pass
+    return pids
+
+def rss_mo(enfants=False):
+    # Mémoire résidente actuelle du processus (ou total de ses workers vivants) ; None si non mesurable
+    if psutil is not None:
+        processus = psutil.Process()
+        total = 0
+        for cible in (processus.children(recursive=True) if enfants else [processus]):
+            try:
+                total += cible.memory_info().rss
+            except psutil.Error:
+                pass
+        return round(total / 2 ** 20, 1)
+    if sys.platform.startswith('linux'):
+        total = 0
+        for pid in (pids_enfants_linux() if enfants else ['self']):
+            try:
+                with open(f'/proc/{pid}/statm') as f:
+                    total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+            except (OSError, ValueError, IndexError):
+                pass
+        return round(total / 2 ** 20, 1)
+    return None
+
+class Profilage:
+    # Relevé opt-in, étape par étape, de la durée, du nombre de lignes traitées et de la mémoire résidente :
+    # pic pendant l'étape (relevé périodique, pour le processus et pour ses workers) et variation sur l'étape
+    def __init__(self):
+        self.mesures = []
+        self.debut = time.perf_counter()
+
+    @contextmanager
+    def etape(self, nom):
+        mesure = {'etape': nom, 'lignes': None}
+        depart = rss_mo()
+        pics = {'pic_rss_mo': depart, 'pic_rss_workers_mo': rss_mo(enfants=True)}
+        def relever():
+            for cle, enfants in (('pic_rss_mo', False), ('pic_rss_workers_mo', True)):
+                valeur = rss_mo(enfants)
+                if valeur is not None and (pics[cle] is None or valeur > pics[cle]):
+                    pics[cle] = valeur
+        fin = threading.Event()
+        def surveiller():
+            while not fin.wait(INTERVALLE_RSS_S):
+                relever()
+        releveur = threading.Thread(target=surveiller, daemon=True)
+        releveur.start()
+        debut = time.perf_counter()
+        try:
+            yield mesure
+        finally:
+            mesure['duree_s'] = round(time.perf_counter() - debut, 4)
+            fin.set()
+            releveur.join()
+            relever()
+            mesure.update(pics)
+            arrivee = rss_mo()
+            mesure['delta_rss_mo'] = round(arrivee - depart, 1) if depart is not None else None
+            self.mesures.append(mesure)
+
+    def ecrire(self, base, **contexte):
+        journal = {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'duree_totale_s': round(time.perf_counter() - self.debut, 4),
+            **contexte,
+            'etapes': self.mesures
+        }
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(journal, f, ensure_ascii=False, indent=2)
+        pd.DataFrame(self.mesures).to_csv(base + '.csv', index=False, encoding='utf-8')
+        return [base + '.json', base + '.csv']
+
+class SansProfilage:
+    # Profilage désactivé : étapes sans chronométrage ni thread de relevé mémoire (aucun thread vivant quand
+    # les pools de décodage et de contrôle par tranches créent leurs processus)
+    @contextmanager
+    def etape(self, nom):
+        yield {}
+
+def finaliser_tables(df_params, df_events):
+    # Suppression explicite de la colonne "Type de ROP" si elle existe encore
+    if "Type de ROP" in df_events.columns:
+        df_events = df_events.drop(columns=["Type de ROP"])
+    if not df_events.empty:
+        # On ne met pas "Type de ROP" dans l'ordre des colonnes
+        cols = ['Fichier', 'MétaNommage', 'N° évenement'] + [
+            col for col in df_events.columns if col not in ['Fichier', 'MétaNommage', 'N° évenement']
+        ]
+        df_events = df_events[cols]
+    if "Type d'évenements" in df_events.columns and "Distance" in df_events.columns:
+        last_fin_de_fibre = (
+            df_events[df_events["Type d'évenements"] == "Fin de fibre"]
+            .groupby('Fichier', observed=True)['Distance']
+            .last()
+            .reset_index()
+            .rename(columns={'Distance': 'Distance Totale(km)_new'})
+        )
+        df_params = df_params.merge(last_fin_de_fibre, on='Fichier', how='left')
+        df_params['Distance Totale(km)'] = df_params['Distance Totale(km)_new']
+        df_params = df_params.drop(columns=['Distance Totale(km)_new'])
+    return df_params, df_events
+
+TOLERANCE_APPARIEMENT_KM = 0.02
+
+def apparier_bidirectionnel(df_params, df_events, tolerance_km=TOLERANCE_APPARIEMENT_KM):
+    # Mesures A->B / B->A d'une même fibre (câble, n° de fibre, lambda, extrémités) appariées par jointure ;
+    # chaque courbe est associée à la mesure la plus récente du sens opposé. Les événements sont ensuite
+    # alignés par distance (fin de fibre - distance dans le sens opposé) pour moyenner les pertes.
+    def texte(nom):
+        # Colonnes catégorielles : '' n'est pas une catégorie, le remplissage se fait sur les valeurs
+        return colonne(df_params, nom).astype(object).fillna('').astype(str).str.strip()
+    loc_a = texte('location A')
+    loc_b = texte('location B')
+    determine = (loc_a != '') & (loc_b != '') & (loc_a != loc_b)
+    df_params['Sens'] = np.where(determine, loc_a + '→' + loc_b, '')
+    cles = pd.DataFrame({
+        'cable': texte('cable ID'),
+        'fibre': texte('fiber ID'),
+        'lambda': par_valeur(colonne(df_params, 'Lambda'), normaliser_lambda),
+        'bout_1': loc_a.where(loc_a < loc_b, loc_b), 'bout_2': loc_b.where(loc_a < loc_b, loc_a),
+        'aller': loc_a < loc_b,
+        'date': pd.to_datetime(colonne(df_params, 'date/time', None), errors='coerce', dayfirst=True),
+        'Fichier': colonne(df_params, 'Fichier'),
+        'fin': pd.to_numeric(colonne(df_params, 'Distance Totale(km)', np.nan), errors='coerce'),
+    })[determine.to_numpy()]
+    cle = ['cable', 'fibre', 'lambda', 'bout_1', 'bout_2']
+    recentes = cles.sort_values('date', kind='stable', na_position='first').drop_duplicates(cle + ['aller'], keep='last')
+    opposees = recentes.assign(aller=~recentes['aller'])[cle + ['aller', 'Fichier', 'fin']]
+    paires = cles.reset_index().merge(opposees, on=cle + ['aller'], how='inner', suffixes=('', ' opposé'))
+    paires = paires.drop_duplicates('Fichier')
+    df_params['Fichier opposé'] = pd.Series(paires['Fichier opposé'].to_numpy(), index=paires['index']).reindex(
+        df_params.index, fill_value='')
+    df_events['Fichier opposé'] = df_events['Fichier'].astype(object).map(
+        dict(zip(paires['Fichier'], paires['Fichier opposé']))).fillna('') if 'Fichier' in df_events.columns else ''
+    df_events['Atténuation bidir.(dB)'] = np.nan
+    if paires.empty or not {'Distance', 'Atténuation(dB)'} <= set(df_events.columns):
+        return df_params, df_events
+    evenements = pd.DataFrame({
+        'Fichier': df_events['Fichier'].astype(str),
+        'distance': pd.to_numeric(df_events['Distance'], errors='coerce'),
+        'perte': pd.to_numeric(df_events['Atténuation(dB)'], errors='coerce'),
+        'ligne': np.arange(len(df_events)),
+    }).dropna(subset=['distance'])
+    # Chaque événement est projeté dans le repère de la courbe appariée, puis rapproché du plus proche de
+    # l'autre sens ; seuls les couples réciproques (chacun le plus proche de l'autre) sont retenus
+    gauche = evenements.merge(paires[['Fichier', 'Fichier opposé']], on='Fichier')
+    droite = evenements.merge(paires[['Fichier', 'Fichier opposé', 'fin opposé']],
+                              left_on='Fichier', right_on='Fichier opposé', suffixes=('', '_paire'))
+    droite = droite.assign(distance=droite['fin opposé'] - droite['distance'], Fichier=droite['Fichier_paire'])
+    droite = droite.dropna(subset=['distance'])[['Fichier', 'distance', 'perte', 'ligne']]
+    gauche = gauche[['Fichier', 'distance', 'perte', 'ligne']].sort_values('distance', kind='stable')
+    droite = droite.sort_values('distance', kind='stable')
+    vers_droite = pd.merge_asof(gauche, droite, on='distance', by='Fichier', direction='nearest',
+                                tolerance=tolerance_km, suffixes=('', ' opposée'))
+    vers_gauche = pd.merge_asof(droite, gauche, on='distance', by='Fichier', direction='nearest',
+                                tolerance=tolerance_km, suffixes=(' opposée', ''))
+    reciproques = vers_droite.merge(vers_gauche[['ligne', 'ligne opposée', 'Fichier']],
+                                    on=['ligne', 'ligne opposée', 'Fichier'])
+    moyennes = ((reciproques['perte'] + reciproques['perte opposée']) / 2).round(4).to_numpy()
+    valeurs = df_events['Atténuation bidir.(dB)'].to_numpy(dtype=float, copy=True)
+    valeurs[reciproques['ligne'].to_numpy(dtype=int)] = moyennes
+    df_events['Atténuation bidir.(dB)'] = valeurs
+    return df_params, df_events
+
+FICHIER_REGLES = 'regles_argos.json'
+# Références saisies à chaque analyse (interface, --indice/--impulsion) : absentes du modèle de jeu de règles
+PARAMETRES_APPEL = ('indice_ref', 'impulsion_ref')
+JEU_REGLES_DEFAUT = {
+    'paralleles': 1,
+    'processus': 1,
+    'regles': [{'regle': nom} for nom in
+               ['epissures', 'lambda_indice', 'longueur_fibres', 'parametres', 'temps_mesures', 'doublons', 'nommage',
+                'pente_fibre', 'dynamique', 'marches', 'mesure_opposee', 'epissures_non_appariees',
+                'types_evenements']]
+}
+
+def preparer_regles(jeu_regles, parametres_appel=None, suivi=None):
+    # Jeu de règles -> [(nom, règle, paramètres)] ; paramètres : défauts de la règle < projet < valeurs fournies
+    # à l'appel (None : non fournie), un projet contredit par l'appel est signalé
+    entrees = []
+    for entree in jeu_regles.get('regles', []):
+        entree = dict(entree) if isinstance(entree, dict) else {'regle': entree}
+        nom = entree.pop('regle', None)
+        if nom not in REGLES:
+            raise ValueError(f"Règle inconnue : {nom} (disponibles : {', '.join(REGLES)})")
+        if not entree.pop('actif', True):
+            continue
+        definition = REGLES[nom]
+        inconnus = [cle for cle in entree if cle not in definition['parametres']]
+        if inconnus:
+            raise ValueError(f"Paramètre(s) inconnu(s) pour la règle {nom} : {', '.join(inconnus)}")
+        appel = {
+            cle: val for cle, val in (parametres_appel or {}).items()
+            if cle in definition['parametres'] and val is not None
+        }
+        for cle, val in appel.items():
+            if cle in entree and str(entree[cle]) != str(val):
+                (suivi or SuiviConsole()).info(
+                    "Jeu de règles", f"{nom}.{cle} vaut {entree[cle]} dans le jeu de règles, {val} fourni à l'analyse est retenu."
+                )
+        entrees.append((nom, definition, {**definition['parametres'], **entree, **appel}))
+    return entrees
+
+def charger_regles(chemin):
+    with open(chemin, encoding='utf-8') as f:
+        jeu_regles = json.load(f)
+    if isinstance(jeu_regles, list):
+        jeu_regles = {'regles': jeu_regles}
+    preparer_regles(jeu_regles)
+    return jeu_regles
+
+def regles_projet(sor_files):
+    # Jeu de règles propre au projet : regles_argos.json posé à côté des .sor
+    if not sor_files:
+        return None
+    chemin = os.path.join(os.path.dirname(sor_files[0]), FICHIER_REGLES)
+    return charger_regles(chemin) if os.path.isfile(chemin) else None
+
+def concatener_anomalies(df_anomalies):
+    # Une seule concaténation, avec le même remplissage que les ajouts successifs d'autrefois : une colonne
+    # apportée par une règle vaut "" sur les lignes des règles précédentes. La première règle fixe les colonnes
+    # de départ même sans anomalie, les suivantes sans anomalie n'apportent rien.
+    if not df_anomalies:
+        return pd.DataFrame()
+    df_anomalies = df_anomalies[:1] + [df for df in df_anomalies[1:] if not df.empty]
+    premiere = {}
+    for k, df in enumerate(df_anomalies):
+        for col in df.columns:
+            premiere.setdefault(col, k)
+    df_anomalies = [
+        df.assign(**{col: "" for col, k_col in premiere.items() if k_col > k and col not in df.columns})
+        for k, df in enumerate(df_anomalies)
+    ]
+    if len(df_anomalies) == 1:
+        return df_anomalies[0]
+    return pd.concat(df_anomalies, ignore_index=True)
+
+# En dessous, une règle partitionnable s'exécute en un seul passage : le lancement des processus coûterait plus
+LIGNES_MIN_PARTITION = 20000
+
+class TablePartagee:
+    # Table écrite une fois au format Arrow (IPC) dans un fichier temporaire : chaque processus la relit en
+    # mémoire mappée, sans copie par le pickle, et ne matérialise que les lignes de sa tranche
+    def __init__(self, df, dossier=None):
+        import pyarrow as pa
+        fd, self.chemin = tempfile.mkstemp(prefix='argos_table_', suffix='.arrow', dir=dossier)
+        os.close(fd)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # Types pandas d'origine, rétablis à la relecture (Arrow relit par exemple le texte objet en str)
+        self.types = df.dtypes.to_dict()
+        with pa.OSFile(self.chemin, 'wb') as sortie, pa.ipc.new_file(sortie, table.schema) as ecrivain:
+            ecrivain.write_table(table)
+
+    def fermer(self):
+        try:
+            os.remove(self.chemin)
+        except OSError:
+            pass
+
+def tranches_groupes(cles, nb_tranches):
+    # Positions des lignes de chaque tranche : groupes pris dans l'ordre trié des clés (ordre des catégories pour
+    # une colonne catégorielle, comme les tris des règles), découpés en tranches consécutives de tailles voisines
+    # sans couper un groupe. None si une clé manque : les règles ne rangent pas toutes les manquants pareil.
+    codes, uniques = pd.factorize(cles, sort=True)
+    if len(codes) == 0 or (codes < 0).any():
+        return None
+    cumul = np.cumsum(np.bincount(codes, minlength=len(uniques)))
+    bornes = np.searchsorted(cumul, np.arange(1, nb_tranches) * cumul[-1] / nb_tranches)
+    tranche = np.searchsorted(bornes, np.arange(len(uniques)), side='right')[codes]
+    return [lignes for lignes in (np.flatnonzero(tranche == k) for k in range(nb_tranches)) if len(lignes)]
+
+def controler_tranche(chemin, types, nom, parametres, lignes):
+    # Exécuté dans un processus du pool : la règle voit sa tranche comme une table complète
+    import pyarrow as pa
+    with pa.memory_map(chemin) as source:
+        df = pa.ipc.open_file(source).read_all().take(lignes).to_pandas()
+    df = df.astype({col: type_col for col, type_col in types.items() if df[col].dtype != type_col})
+    definition = REGLES[nom]
+    derivees = {derivee: DERIVEES[derivee](df) for derivee in definition['derivees']}
+    return definition['fonction'](df, derivees, **parametres)
+
+def controler_par_tranches(pool, partagee, table, nom, definition, parametres, nb_tranches):
+    # Tranches contrôlées en parallèle, résultats concaténés dans l'ordre des tranches : identiques à un seul passage
+    tranches = tranches_groupes(colonne(table, definition['groupe']), nb_tranches)
+    if tranches is None or len(tranches) < 2:
+        return None
+    resultats = list(pool.map(
+        controler_tranche, [partagee.chemin] * len(tranches), [partagee.types] * len(tranches), [nom] * len(tranches),
+        [parametres] * len(tranches), tranches
+    ))
+    # Tranches sans anomalie écartées : elles n'imposeraient que leurs types de colonnes vides
+    return pd.concat([df for df in resultats if not df.empty] or resultats[:1], ignore_index=True)
+
+def tables_groupes(df_params, historique, definition):
+    # Courbes de l'historique (lot compris) appartenant aux groupes de la règle présents dans le lot
+    hist_params, hist_events = historique
+    groupe = definition['groupe']
+    params = hist_params[colonne(hist_params, groupe).isin(colonne(df_params, groupe))]
+    events = hist_events[colonne(hist_events, 'Fichier').isin(colonne(params, 'Fichier'))]
+    return {'parametres': params, 'evenements': events}
+
+def appliquer_regles(df_params, df_events, entrees, paralleles=1, suivi=None, profil=None, historique=None,
+                     processus=1):
+    # historique : (df_params, df_events) du lot et des livraisons précédentes ; les règles de groupe
+    # (câble, NomBase) y comparent les courbes du lot à celles déjà livrées, les autres ne voient que le lot.
+    # processus : les règles partitionnables sont réparties par tranches de groupes (câble, NomBase) sur autant
+    # de processus, la table étant partagée une fois pour toutes au format Arrow
+    suivi = suivi or Suivi()
+    mesurer = profil or SansProfilage()
+    tables = {'parametres': df_params, 'evenements': df_events}
+    with mesurer.etape('derivees'):
+        normaliser_colonnes(df_params)
+        noms_derivees = dict.fromkeys(nom for _, definition, _ in entrees for nom in definition['derivees'])
+        derivees = {nom: DERIVEES[nom](df_params) for nom in noms_derivees}
+    partage = {'pool': None, 'tables': {}}
+    verrou = threading.Lock()
+    def table_partagee(table):
+        # Pool et table Arrow créés à la première règle partitionnée ; la table est gardée avec sa copie
+        # partagée pour que son id ne soit pas réutilisé
+        with verrou:
+            if partage['pool'] is None:
+                partage['pool'] = ProcessPoolExecutor(max_workers=processus)
+            if id(table) not in partage['tables']:
+                partage['tables'][id(table)] = (table, TablePartagee(table))
+            return partage['pool'], partage['tables'][id(table)][1]
+    def par_tranches(nom, definition, parametres, table):
+        if not (processus and processus > 1 and definition['partitionnable'] and PYARROW
+                and len(table) >= LIGNES_MIN_PARTITION):
+            return None
+        try:
+            pool, partagee = table_partagee(table)
+        except Exception as e:
+            # Colonne non convertible en Arrow : règle exécutée en un seul passage
+            suivi.info("Contrôles par tranches", f"Table non partageable ({e}), contrôle en un seul passage.")
+            return None
+        try:
+            return controler_par_tranches(pool, partagee, table, nom, definition, parametres, processus)
+        except BrokenProcessPool as e:
+            suivi.info("Contrôles par tranches", f"Pool interrompu ({e}), contrôle en un seul passage.")
+            return None
+    def executer(entree):
+        nom, definition, parametres = entree
+        table = tables[definition['table']]
+        derivees_regle = derivees
+        if historique is not None and definition['groupe'] != 'Fichier':
+            tables_regle = tables_groupes(df_params, historique, definition)
+            table = tables_regle[definition['table']]
+            derivees_regle = {derivee: DERIVEES[derivee](tables_regle['parametres']) for derivee in definition['derivees']}
+        with mesurer.etape(nom) as mesure:
+            # Règle inapplicable à ce lot (colonne absente) : aucune anomalie
+            if all(col in table.columns for col in definition['colonnes']):
+                df = par_tranches(nom, definition, parametres, table)
+                if df is None:
+                    df = definition['fonction'](table, derivees_regle, **parametres)
+                else:
+                    mesure['processus'] = processus
+            else:
+                df = pd.DataFrame()
+            mesure['lignes'] = len(df)
+        return df
+    def terminer(entree, df):
+        message = entree[1]['message']
+        if message and not df.empty:
+            suivi.info(message[0], message[1].format(len(df)))
+        suivi.anomalies(df)
+        suivi.avancer()
+    df_anomalies = []
+    try:
+        if paralleles and paralleles > 1 and len(entrees) > 1:
+            suivi.etape(f"Application de {len(entrees)} règles en parallèle...")
+            with ThreadPoolExecutor(max_workers=min(paralleles, len(entrees))) as pool:
+                df_anomalies = list(pool.map(executer, entrees))
+            for entree, df in zip(entrees, df_anomalies):
+                terminer(entree, df)
+        else:
+            for entree in entrees:
+                suivi.etape(entree[1]['libelle'])
+                df_anomalies.append(executer(entree))
+                terminer(entree, df_anomalies[-1])
+    finally:
+        if partage['pool'] is not None:
+            partage['pool'].shutdown(cancel_futures=True)
+        for _, partagee in partage['tables'].values():
+            partagee.fermer()
+    return concatener_anomalies(df_anomalies)
+
+def groupes_controles(entrees):
+    # Colonnes bornant les comparaisons entre courbes ; l'appariement A->B / B->A se fait par câble
+    return list(dict.fromkeys(
+        ['cable ID'] + [definition['groupe'] for _, definition, _ in entrees if definition['groupe'] != 'Fichier']
+    ))
+
+def relire_colonnes(df, types):
+    # Lignes relues de la base projet : dates stockées en texte ISO, schéma des tables réappliqué
+    df = df.drop(columns=['Livraison'], errors='ignore')
+    if 'date/time' in df.columns:
+        df['date/time'] = pd.to_datetime(df['date/time'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    return typer_colonnes(df, types)
+
+class BaseProjet:
+    # Base SQLite d'un projet : paramètres, événements et anomalies de toutes les livraisons analysées.
+    # Une courbe relivrée (même nom de fichier) remplace sa version précédente, les anomalies de chaque
+    # livraison sont conservées. Les colonnes qui regroupent les courbes dans les contrôles sont indexées.
+    INDEX = {
+        'parametres': ['Fichier', 'cable ID', 'NomBase', 'Lambda', 'date/time'],
+        'evenements': ['Fichier'],
+        'anomalies': ['Livraison', 'Fichier'],
+    }
+
+    def __init__(self, chemin):
+        os.makedirs(os.path.dirname(os.path.abspath(chemin)), exist_ok=True)
+        self.connexion = sqlite3.connect(chemin, timeout=30)
+        self.connexion.execute(
+            "CREATE TABLE IF NOT EXISTS livraisons ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT NOT NULL, source TEXT, "
+            "nb_fichiers INTEGER NOT NULL, nb_anomalies INTEGER NOT NULL)"
+        )
+        self.connexion.commit()
+
+    def colonnes(self, table):
+        return [ligne[1] for ligne in self.connexion.execute(f'PRAGMA table_info("{table}")')]
+
+    def preparer_table(self, table, colonnes):
+        # Table créée au premier enregistrement, colonnes sans type déclaré : chaque valeur garde le sien
+        # (texte, réel, entier). Une colonne apparue depuis (nouvelle métrique, nouveau champ) est ajoutée.
+        existantes = self.colonnes(table)
+        if not existantes:
+            self.connexion.execute(f'CREATE TABLE "{table}" ("Livraison" INTEGER NOT NULL)')
+            existantes = ['Livraison']
+        for col in colonnes:
+            if col not in existantes:
+                self.connexion.execute(f'ALTER TABLE "{table}" ADD COLUMN "{col}"')
+        for col in self.INDEX[table]:
+            if col in existantes or col in colonnes:
+                index = re.sub(r'\W+', '_', f"idx_{table}_{col}")
+                self.connexion.execute(f'CREATE INDEX IF NOT EXISTS "{index}" ON "{table}" ("{col}")')
+
+    def inserer(self, table, df, livraison):
+        if df.empty:
+            return
+        self.preparer_table(table, list(df.columns))
+        lignes = df.copy()
+        for col in lignes.columns:
+            if pd.api.types.is_datetime64_any_dtype(lignes[col]):
+                # Dates en texte ISO : triables et comparables telles quelles dans les requêtes
+                lignes[col] = lignes[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+            elif lignes[col].dtype == object:
+                # Colonnes mêlant dates et "" (feuille Hors Normes)
+                lignes[col] = lignes[col].map(lambda val: val.strftime('%Y-%m-%d %H:%M:%S') if isinstance(val, datetime) else val)
+        lignes = lignes.astype(object)
+        lignes = lignes.where(lignes.notna(), None)
+        colonnes = ', '.join(f'"{col}"' for col in ['Livraison', *df.columns])
+        self.connexion.executemany(
+            f'INSERT INTO "{table}" ({colonnes}) VALUES ({", ".join("?" * (len(df.columns) + 1))})',
+            ((livraison, *ligne) for ligne in lignes.itertuples(index=False, name=None))
+        )
+
+    def charger_cles(self, nom, valeurs):
+        # Clés du lot en table temporaire : les requêtes s'y joignent par les index, sans limite de paramètres
+        self.connexion.execute(f"CREATE TEMP TABLE IF NOT EXISTS {nom} (valeur PRIMARY KEY)")
+        self.connexion.execute(f"DELETE FROM temp.{nom}")
+        self.connexion.executemany(
+            f"INSERT OR IGNORE INTO temp.{nom} VALUES (?)", ((str(valeur),) for valeur in pd.unique(valeurs))
+        )
+
+    def historique(self, df_params, groupes):
+        # Courbes déjà livrées partageant un groupe de contrôle (câble, NomBase) avec le lot, lues par les index ;
+        # les courbes que le lot relivre en sont exclues
+        existantes = self.colonnes('parametres')
+        groupes = [groupe for groupe in groupes if groupe in existantes and groupe in df_params.columns]
+        if 'Fichier' not in existantes or not groupes:
+            return pd.DataFrame(), pd.DataFrame()
+        self.charger_cles('cles_lot', colonne(df_params, 'Fichier'))
+        conditions = []
+        for k, groupe in enumerate(groupes):
+            self.charger_cles(f'cles_groupe_{k}', colonne(df_params, groupe))
+            conditions.append(f'"{groupe}" IN (SELECT valeur FROM temp.cles_groupe_{k})')
+        hist_params = pd.read_sql_query(
+            f'SELECT * FROM parametres WHERE ({" OR ".join(conditions)}) '
+            f'AND Fichier NOT IN (SELECT valeur FROM temp.cles_lot) ORDER BY rowid', self.connexion
+        )
+        hist_events = pd.DataFrame()
+        if 'Fichier' in self.colonnes('evenements'):
+            self.charger_cles('cles_historique', hist_params['Fichier'])
+            hist_events = pd.read_sql_query(
+                'SELECT * FROM evenements WHERE Fichier IN (SELECT valeur FROM temp.cles_historique) ORDER BY rowid',
+                self.connexion
+            )
+        return relire_colonnes(hist_params, TYPES_PARAMS), relire_colonnes(hist_events, TYPES_EVENTS)
+
+    def charger(self):
+        # Tout l'historique du projet, trié par fichier comme une analyse de l'ensemble des .sor
+        tables = []
+        for table, types in (('parametres', TYPES_PARAMS), ('evenements', TYPES_EVENTS)):
+            df = pd.DataFrame()
+            if 'Fichier' in self.colonnes(table):
+                df = pd.read_sql_query(f'SELECT * FROM "{table}" ORDER BY rowid', self.connexion)
+                df = df.sort_values('Fichier', kind='stable', ignore_index=True)
+            tables.append(relire_colonnes(df, types))
+        return tables
+
+    def enregistrer(self, df_params, df_events, df_hors_normes, source=''):
+        # Une livraison : ses courbes remplacent leurs versions précédentes, ses anomalies s'ajoutent
+        with self.connexion:
+            livraison = self.connexion.execute(
+                "INSERT INTO livraisons (date, source, nb_fichiers, nb_anomalies) VALUES (?, ?, ?, ?)",
+                (datetime.now().isoformat(timespec='seconds'), source, len(df_params), len(df_hors_normes))
+            ).lastrowid
+            self.charger_cles('cles_lot', colonne(df_params, 'Fichier'))
+            for table, df in (('parametres', df_params), ('evenements', df_events)):
+                if 'Fichier' in self.colonnes(table):
+                    self.connexion.execute(f'DELETE FROM "{table}" WHERE Fichier IN (SELECT valeur FROM temp.cles_lot)')
+                self.inserer(table, df, livraison)
+            self.inserer('anomalies', df_hors_normes, livraison)
+        return livraison
+
+    def fermer(self):
+        self.connexion.close()
+
+def joindre_historique(df_params, df_events, hist_params, hist_events):
+    # Lot et courbes déjà livrées réunis, triés par fichier comme une analyse de tout le projet, puis appariés
+    # ensemble : un A->B d'une livraison précédente retrouve le B->A du lot. Le lot en est extrait pour le rapport.
+    fichiers = set(colonne(df_params, 'Fichier'))
+    params = remplacer_lignes(hist_params, fichiers, df_params, TYPES_PARAMS)
+    events = remplacer_lignes(hist_events, fichiers, df_events, TYPES_EVENTS)
+    params, events = apparier_bidirectionnel(params, events)
+    normaliser_colonnes(params)
+    lot_params = params[colonne(params, 'Fichier').isin(fichiers)].reset_index(drop=True)
+    lot_events = events[colonne(events, 'Fichier').isin(fichiers)].reset_index(drop=True)
+    return lot_params, lot_events, (params, events)
+
+def analyser_sor(sor_files, chemin_sortie, indice_ref=None, impulsion_ref=None, suivi=None, nb_workers=None,
+                 format_sortie='xlsx', profil=None, regles=None, lectures=LECTURES_SIMULTANEES, projet=None):
+    # projet : base SQLite du projet, qui reçoit cette livraison et dont l'historique est contrôlé avec elle
+    suivi = suivi or Suivi()
+    mesurer = profil or SansProfilage()
+    homonymes = homonymes_sor(sor_files)
+    if homonymes:
+        raise ValueError(
+            f"Fichiers .sor de même nom dans plusieurs dossiers, un rapport unique les confondrait : "
+            f"{decrire_homonymes(homonymes)}. Faire un rapport par dossier (--par-dossier) ou renommer les courbes."
+        )
+    # Jeu de règles : celui fourni, sinon regles_argos.json du projet, sinon les contrôles standard
+    jeu_regles = regles or regles_projet(sor_files) or JEU_REGLES_DEFAUT
+    entrees = preparer_regles(jeu_regles, {'indice_ref': indice_ref, 'impulsion_ref': impulsion_ref}, suivi)
+    suivi.debut(len(sor_files) + len(entrees) + 2 + bool(projet))
+    suivi.etape("Conversion des fichiers .sor...")
+    flags = 0
+    if sys.platform == "win32":
+        flags = subprocess.CREATE_NO_WINDOW
+    def suivi_conversion(traces):
+        for sor_file, trace in traces:
+            suivi.etape(f"Conversion : {os.path.basename(sor_file)}")
+            suivi.avancer()
+            if trace is not None:
+                yield trace
+    cache = ouvrir_cache()
+    magasin = MagasinTraces()
+    traces = iterer_traces(sor_files, flags, cache, nb_workers=nb_workers, magasin=magasin, lectures=lectures)
+    try:
+        with mesurer.etape('conversion') as mesure:
+            df_params, df_events = construire_dataframes(suivi_conversion(traces))
+            mesure['lignes'] = len(df_params)
+            mesure['evenements'] = len(df_events)
+        suivi.etape("Analyse des fichiers ...")
+        with mesurer.etape('preparation') as mesure:
+            df_params, df_events = finaliser_tables(df_params, df_events)
+            mesure['lignes'] = len(df_params)
+            mesure['evenements'] = len(df_events)
+        with mesurer.etape('metriques') as mesure:
+            df_params = ajouter_metriques(df_params, df_events, magasin, cache)
+            mesure['lignes'] = len(magasin.rangs)
+    finally:
+        # Conversion interrompue : le pool de décodage est arrêté avant la fermeture du magasin et du cache
+        traces.close()
+        magasin.fermer()
+        if cache is not None:
+            cache.fermer()
+    base = BaseProjet(projet) if projet else None
+    try:
+        historique = None
+        with mesurer.etape('appariement') as mesure:
+            if base is None:
+                df_params, df_events = apparier_bidirectionnel(df_params, df_events)
+            else:
+                hist_params, hist_events = base.historique(normaliser_colonnes(df_params.copy()), groupes_controles(entrees))
+                df_params, df_events, historique = joindre_historique(df_params, df_events, hist_params, hist_events)
+                mesure['historique'] = len(hist_params)
+            mesure['lignes'] = int((colonne(df_params, 'Fichier opposé') != '').sum())
+        suivi.avancer()
+        df_hors_normes = appliquer_regles(
+            df_params, df_events, entrees, jeu_regles.get('paralleles', 1), suivi=suivi, profil=mesurer,
+            historique=historique, processus=jeu_regles.get('processus', 1)
+        )
+        suivi.etape("Export du rapport Excel..." if format_sortie == 'xlsx' else f"Export du rapport {format_sortie}...")
+        with mesurer.etape('export') as mesure:
+            exporter_rapport(chemin_sortie, df_params, df_events, df_hors_normes, format_sortie)
+            mesure['lignes'] = len(df_params) + len(df_events) + len(df_hors_normes)
+        suivi.avancer()
+        if base is not None:
+            suivi.etape("Enregistrement de la livraison dans la base projet...")
+            with mesurer.etape('projet') as mesure:
+                source = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in sor_files]) if sor_files else ''
+                mesure['livraison'] = base.enregistrer(df_params, df_events, df_hors_normes, source)
+                mesure['lignes'] = len(df_params) + len(df_events) + len(df_hors_normes)
+            suivi.avancer()
+    finally:
+        if base is not None:
+            base.fermer()
+    if profil is not None:
+        profil.ecrire(
+            os.path.splitext(chemin_sortie)[0] + '_profil',
+            rapport=chemin_sortie, nb_fichiers=len(sor_files), nb_workers=nb_workers or os.cpu_count()
+        )
+    suivi.etape("Traitement terminé !")
+    return df_params, df_events, df_hors_normes
+
+def analyser_projet(chemin_projet, chemin_sortie, indice_ref=None, impulsion_ref=None, suivi=None,
+                    format_sortie='xlsx', profil=None, regles=None):
+    # Rapport de tout l'historique d'une base projet, sans relire aucun .sor
+    suivi = suivi or Suivi()
+    mesurer = profil or SansProfilage()
+    jeu_regles = regles or regles_projet([chemin_projet]) or JEU_REGLES_DEFAUT
+    entrees = preparer_regles(jeu_regles, {'indice_ref': indice_ref, 'impulsion_ref': impulsion_ref}, suivi)
+    suivi.debut(len(entrees) + 3)
+    suivi.etape("Lecture de la base projet...")
+    base = BaseProjet(chemin_projet)
+    try:
+        with mesurer.etape('historique') as mesure:
+            df_params, df_events = base.charger()
+            mesure['lignes'] = len(df_params)
+            mesure['evenements'] = len(df_events)
+    finally:
+        base.fermer()
+    suivi.avancer()
+    with mesurer.etape('appariement') as mesure:
+        df_params, df_events = apparier_bidirectionnel(df_params, df_events)
+        mesure['lignes'] = int((colonne(df_params, 'Fichier opposé') != '').sum())
+    suivi.avancer()
+    df_hors_normes = appliquer_regles(
+        df_params, df_events, entrees, jeu_regles.get('paralleles', 1), suivi=suivi, profil=mesurer,
+        processus=jeu_regles.get('processus', 1)
+    )
+    suivi.etape("Export du rapport Excel..." if format_sortie == 'xlsx' else f"Export du rapport {format_sortie}...")
+    with mesurer.etape('export') as mesure:
+        exporter_rapport(chemin_sortie, df_params, df_events, df_hors_normes, format_sortie)
+        mesure['lignes'] = len(df_params) + len(df_events) + len(df_hors_normes)
+    suivi.avancer()
+    if profil is not None:
+        profil.ecrire(os.path.splitext(chemin_sortie)[0] + '_profil', rapport=chemin_sortie, projet=chemin_projet)
+    suivi.etape("Traitement terminé !")
+    return df_params, df_events, df_hors_normes
+
+def exporter_rapport_atomique(chemin_sortie, df_params, df_events, df_hors_normes, format_sortie='xlsx'):
+    # Rapport écrit à côté puis substitué d'un bloc : un lecteur ne voit jamais de fichier à moitié écrit
+    dossier = os.path.dirname(os.path.abspath(chemin_sortie))
+    with tempfile.TemporaryDirectory(prefix='.argos_', dir=dossier) as temporaire:
+        provisoire = os.path.join(temporaire, os.path.basename(chemin_sortie))
+        exporter_rapport(provisoire, df_params, df_events, df_hors_normes, format_sortie)
+        for source, cible in zip(chemins_rapport(provisoire, format_sortie),
+                                 chemins_rapport(chemin_sortie, format_sortie)):
+            os.replace(source, cible)
+
+INTERVALLE_SURVEILLANCE_S = 2.0
+
+def remplacer_lignes(df, fichiers, nouvelles, types):
+    # Lignes des fichiers retirés ou remplacés ôtées, lignes décodées insérées : la table reste triée par fichier
+    # comme pour une analyse complète du dossier, les contrôles sensibles à l'ordre (doublons, dates égales,
+    # mesure la plus récente) donnent donc le même résultat
+    morceaux = [morceau for morceau in (df[~colonne(df, 'Fichier').isin(fichiers)], nouvelles) if not morceau.empty]
+    if not morceaux:
+        return pd.DataFrame()
+    df = pd.concat(morceaux, ignore_index=True).sort_values('Fichier', kind='stable', ignore_index=True)
+    return typer_colonnes(df, types)
+
+class Surveillance:
+    # Service de surveillance d'un dossier de dépôt : les .sor arrivés, modifiés ou retirés depuis le dernier
+    # passage sont décodés dans un pool de workers permanent, puis seuls les groupes de courbes touchés
+    # (câble, NomBase, courbe) sont recontrôlés ; le rapport est réécrit après chaque lot.
+    def __init__(self, dossiers, chemin_sortie, indice_ref=None, impulsion_ref=None, nb_workers=None,
+                 format_sortie='xlsx', regles=None, intervalle=INTERVALLE_SURVEILLANCE_S, recursif=False,
+                 lectures=LECTURES_SIMULTANEES):
+        self.dossiers = [os.path.abspath(dossier) for dossier in dossiers]
+        self.recursif = recursif
+        self.lectures = lectures
+        self.chemin_sortie = chemin_sortie
+        self.format_sortie = format_sortie
+        self.intervalle = intervalle
+        self.nb_workers = nombre_workers(nb_workers or os.cpu_count() or 1)
+        self.jeu_regles = regles or regles_projet([os.path.join(self.dossiers[0], FICHIER_REGLES)]) or JEU_REGLES_DEFAUT
+        self.entrees = preparer_regles(
+            self.jeu_regles, {'indice_ref': indice_ref, 'impulsion_ref': impulsion_ref}, SuiviConsole()
+        )
+        self.flags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+        self.df_params = pd.DataFrame()
+        self.df_events = pd.DataFrame()
+        self.anomalies = {nom: pd.DataFrame() for nom, _, _ in self.entrees}
+        # Fichiers intégrés au rapport et fichiers vus au passage précédent : (taille, date de modification)
+        self.traites = {}
+        self.vus = {}
+        # Fichiers de même nom dans plusieurs sous-dossiers : tenus hors du rapport tant qu'ils sont homonymes
+        self.homonymes = {}
+        self.rapport_a_jour = True
+        self.arret = threading.Event()
+        self.cache = None
+        self.pool = None
+
+    def scanner(self):
+        signatures = {}
+        for entree in parcourir_dossiers(self.dossiers, self.recursif, self.lectures):
+            try:
+                stat = entree.stat()
+            except OSError:
+                # Fichier retiré entre le listage et la lecture de ses métadonnées
+                continue
+            signatures[entree.path] = (stat.st_size, stat.st_mtime_ns)
+        homonymes = homonymes_sor(signatures)
+        if homonymes and homonymes != self.homonymes:
+            print(f"⚠️ Fichiers de même nom dans plusieurs dossiers, écartés du rapport : "
+                  f"{decrire_homonymes(homonymes)}", flush=True)
+        self.homonymes = homonymes
+        for chemins in homonymes.values():
+            for chemin in chemins:
+                del signatures[chemin]
+        return signatures
+
+    def changements(self):
+        # Un fichier n'est pris qu'une fois sa signature stable entre deux passages (dépôt terminé)
+        signatures = self.scanner()
+        prets = sorted(
+            chemin for chemin, signature in signatures.items()
+            if self.vus.get(chemin) == signature and self.traites.get(chemin) != signature
+        )
+        retires = sorted(chemin for chemin in self.traites if chemin not in signatures)
+        self.vus = signatures
+        return prets, retires
+
+    def creer_pool(self):
+        # Ctrl+C n'arrête que le service : les workers l'ignorent et sont arrêtés par shutdown
+        return ProcessPoolExecutor(max_workers=self.nb_workers, initializer=signal.signal,
+                                   initargs=(signal.SIGINT, signal.SIG_IGN))
+
+    def decoder(self, sor_files):
+        if self.pool is not None:
+            try:
+                self.pool.submit(int)
+            except BrokenProcessPool:
+                # Worker tué entre deux lots (mémoire, antivirus...) : pool recréé plutôt que repli sur le CLI
+                self.pool.shutdown(cancel_futures=True)
+                self.pool = self.creer_pool()
+        magasin = MagasinTraces()
+        try:
+            df_params, df_events = construire_dataframes(
+                trace for _, trace in iterer_traces(
+                    sor_files, self.flags, self.cache, self.nb_workers, magasin, self.pool, self.lectures
+                )
+                if trace is not None
+            )
+            df_params, df_events = finaliser_tables(df_params, df_events)
+            df_params = ajouter_metriques(df_params, df_events, magasin, self.cache)
+        finally:
+            magasin.fermer()
+        return normaliser_colonnes(df_params), df_events
+
+    def integrer(self, prets, retires):
+        sortants = {nom_fichier_sor(chemin) for chemin in prets + retires}
+        nouveaux_params, nouveaux_events = self.decoder(prets) if prets else (pd.DataFrame(), pd.DataFrame())
+        precedent = self.df_params
+        anciens = precedent[colonne(precedent, 'Fichier').isin(sortants)]
+        self.df_params = remplacer_lignes(precedent, sortants, nouveaux_params, TYPES_PARAMS)
+        self.df_events = remplacer_lignes(self.df_events, sortants, nouveaux_events, TYPES_EVENTS)
+        # L'appariement A->B / B->A ne relie que des courbes d'un même câble : seuls les câbles touchés sont refaits
+        cables = set(colonne(anciens, 'cable ID')) | set(colonne(nouveaux_params, 'cable ID'))
+        touches = colonne(self.df_params, 'cable ID').isin(cables)
+        self.apparier(touches)
+        # Lignes dont les contrôles peuvent changer : courbes retirées ou remplacées, et courbes des câbles touchés
+        modifiees = pd.concat([anciens, self.df_params[touches]])
+        for nom, definition, parametres in self.entrees:
+            self.recontroler(nom, definition, parametres, precedent, modifiees)
+
+    def apparier(self, touches):
+        for col in ('Sens', 'Fichier opposé'):
+            if col not in self.df_params.columns:
+                self.df_params[col] = ''
+        if 'Fichier opposé' not in self.df_events.columns:
+            self.df_events['Fichier opposé'] = ''
+        if 'Atténuation bidir.(dB)' not in self.df_events.columns:
+            self.df_events['Atténuation bidir.(dB)'] = np.nan
+        if not touches.any():
+            return
+        lignes_events = colonne(self.df_events, 'Fichier').isin(colonne(self.df_params[touches], 'Fichier'))
+        df_params, df_events = apparier_bidirectionnel(self.df_params[touches].copy(), self.df_events[lignes_events].copy())
+        for col in ('Sens', 'Fichier opposé'):
+            self.df_params.loc[touches, col] = df_params[col].to_numpy()
+        for col in ('Fichier opposé', 'Atténuation bidir.(dB)'):
+            self.df_events.loc[lignes_events, col] = df_events[col].to_numpy()
+
+    def recontroler(self, nom, definition, parametres, precedent, modifiees):
+        # Groupes de la règle concernés (câbles, NomBase, courbes) : leurs anomalies sont recalculées en bloc
+        groupe = definition['groupe']
+        groupes = set(colonne(modifiees, groupe))
+        fichiers = set(colonne(precedent, 'Fichier')[colonne(precedent, groupe).isin(groupes)])
+        lignes = colonne(self.df_params, groupe).isin(groupes)
+        df_params = self.df_params[lignes].copy()
+        fichiers |= set(colonne(df_params, 'Fichier'))
+        df_events = self.df_events[colonne(self.df_events, 'Fichier').isin(fichiers)].copy()
+        nouvelles = pd.DataFrame()
+        if len(df_params):
+            nouvelles = appliquer_regles(df_params, df_events, [(nom, definition, parametres)])
+        conservees = self.anomalies[nom]
+        conservees = conservees[~colonne(conservees, 'Fichier').isin(fichiers)]
+        morceaux = [df for df in (conservees, nouvelles) if not df.empty]
+        self.anomalies[nom] = self.ordonner(definition, pd.concat(morceaux, ignore_index=True)) if morceaux else nouvelles
+
+    def ordonner(self, definition, df):
+        # Ordre d'un passage complet : groupes dans l'ordre trié de leur clé pour les règles partitionnables, sinon
+        # ordre des courbes. Les anomalies d'un groupe viennent toutes d'un même bloc, déjà dans l'ordre de la règle.
+        fichiers = colonne(self.df_params, 'Fichier').drop_duplicates()
+        rangs = colonne(df, 'Fichier').map(pd.Series(fichiers.index, index=fichiers.to_numpy()))
+        if definition['partitionnable']:
+            rangs, _ = pd.factorize(rangs.map(colonne(self.df_params, definition['groupe']).astype(str)), sort=True)
+        return df.iloc[np.argsort(np.asarray(rangs, dtype=float), kind='stable')].reset_index(drop=True)
+
+    def exporter(self):
+        df_hors_normes = concatener_anomalies([self.anomalies[nom] for nom, _, _ in self.entrees])
+        exporter_rapport_atomique(self.chemin_sortie, self.df_params, self.df_events, df_hors_normes, self.format_sortie)
+        return df_hors_normes
+
+    def passage(self):
+        prets, retires = self.changements()
+        if prets or retires:
+            debut = time.perf_counter()
+            etat = (self.df_params, self.df_events, dict(self.anomalies))
+            try:
+                self.integrer(prets, retires)
+            except Exception:
+                # Lot en échec : état précédent rétabli, ses fichiers seront repris au prochain passage
+                self.df_params, self.df_events, self.anomalies = etat
+                raise
+            for chemin in prets:
+                self.traites[chemin] = self.vus[chemin]
+            for chemin in retires:
+                del self.traites[chemin]
+            self.rapport_a_jour = False
+            print(f"🔄 {len(prets)} fichier(s) ajouté(s) ou modifié(s), {len(retires)} retiré(s) "
+                  f"({time.perf_counter() - debut:.2f} s)", flush=True)
+        if not self.rapport_a_jour:
+            # Rapport ouvert ailleurs (Excel verrouille le fichier sous Windows) : nouvel essai au passage suivant
+            try:
+                df_hors_normes = self.exporter()
+                self.rapport_a_jour = True
+                print(f"✅ {len(self.df_params)} fichiers, {len(df_hors_normes)} lignes hors normes : "
+                      f"{', '.join(chemins_rapport(self.chemin_sortie, self.format_sortie))}", flush=True)
+            except OSError as e:
+                print(f"⚠️ Rapport non mis à jour : {e}", flush=True)
+
+    def executer(self):
+        self.cache = ouvrir_cache()
+        self.pool = self.creer_pool() if sorparse is not None else None
+        print(f"👀 Surveillance de {', '.join(self.dossiers)} (Ctrl+C pour arrêter)", flush=True)
+        try:
+            while not self.arret.is_set():
+                try:
+                    self.passage()
+                except Exception as e:
+                    print(f"❌ Erreur : {e}", file=sys.stderr, flush=True)
+                self.arret.wait(self.intervalle)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+            if self.cache is not None:
+                self.cache.fermer()
+
+def traitement_otdr(sor_files, excel_output_path, indice_ref, impulsion_ref, suivi):
+    # Thread d'analyse de l'interface : son issue est publiée dans la file, comme le reste du suivi
+    try:
+        profil = Profilage() if os.environ.get('ARGOS_PROFIL') else None
+        analyser_sor(
+            sor_files, excel_output_path, indice_ref, impulsion_ref, suivi, profil=profil,
+            projet=os.environ.get('ARGOS_PROJET')
+        )
+        suivi.file.put(('fin', excel_output_path))
+    except AnalyseAnnulee:
+        suivi.file.put(('annule',))
+    except Exception as e:
+        suivi.file.put(('erreur', str(e)))
+
+def scanner_dossier(dossier, recursif=False):
+    # Une passe os.scandir : le type de chaque entrée est connu sans stat supplémentaire (d_type sous Linux,
+    # données de l'énumération sous Windows), seuls les .sor et, en récursif, les sous-dossiers sont retenus
+    fichiers, sous_dossiers = [], []
+    try:
+        with os.scandir(dossier) as entrees:
+            for entree in entrees:
+                if entree.name.lower().endswith('.sor') and entree.is_file():
+                    fichiers.append(entree)
+                elif recursif and entree.is_dir(follow_symlinks=False):
+                    sous_dossiers.append(entree.path)
+    except OSError as e:
+        print(f"⚠️ Dossier illisible {dossier} : {e}", flush=True)
+    return fichiers, sous_dossiers
+
+def parcourir_dossiers(dossiers, recursif=False, lectures=LECTURES_SIMULTANEES):
+    # Entrées .sor des dossiers (et de leurs sous-dossiers par site en récursif) ; les dossiers d'un même niveau
+    # sont listés en parallèle pour recouvrir la latence des partages réseau
+    entrees_sor = []
+    a_lister = list(dossiers)
+    with ThreadPoolExecutor(max_workers=max(1, lectures)) as pool:
+        while a_lister:
+            suivants = []
+            for fichiers, sous_dossiers in pool.map(scanner_dossier, a_lister, [recursif] * len(a_lister)):
+                entrees_sor += fichiers
+                suivants += sous_dossiers
+            a_lister = suivants
+    return entrees_sor
+
+def lister_sor(chemins, recursif=False, lectures=LECTURES_SIMULTANEES):
+    # Dossiers (leurs .sor, sous-dossiers compris en récursif), fichiers ou motifs glob, dans l'ordre donné
+    # et sans doublon
+    sor_files = []
+    for chemin in chemins:
+        if os.path.isdir(chemin):
+            # Entrées déjà typées par scandir : aucun stat supplémentaire par fichier
+            sor_files += sorted(entree.path for entree in parcourir_dossiers([chemin], recursif, lectures))
+            continue
+        if os.path.isfile(chemin):
+            candidats = [chemin]
+        else:
+            # En récursif, '**' parcourt aussi les sous-dossiers (ex. 'livraison/**/*.sor')
+            candidats = sorted(glob.glob(chemin, recursive=recursif))
+        sor_files += [f for f in candidats if f.lower().endswith('.sor') and os.path.isfile(f)]
+    return list(dict.fromkeys(os.path.abspath(f) for f in sor_files))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Analyse ARGOS de fichiers OTDR .sor sans interface graphique."
+    )
+    parser.add_argument('chemins', nargs='*', help="Dossiers, fichiers .sor ou motifs glob (ex. 'livraison/*/*.sor')")
+    parser.add_argument('--indice', help="Indice de réfraction de référence, prioritaire sur le jeu de règles "
+                                          "(défaut : celui du jeu de règles, sinon 1.4675)")
+    parser.add_argument('--impulsion', help="Impulsion de référence en ns, prioritaire sur le jeu de règles "
+                                            "(défaut : celle du jeu de règles, sinon 30)")
+    parser.add_argument('--sortie', help="Rapport Excel à produire ; avec --par-dossier, dossier recevant les rapports "
+                                         "(défaut : rapport_otdr_final.xlsx à côté des .sor)")
+    parser.add_argument('--format', choices=FORMATS_SORTIE, default='xlsx',
+                        help="xlsx (défaut), ou un fichier csv/parquet par feuille pour les chaînes de traitement")
+    parser.add_argument('--regles', help=f"Jeu de règles JSON (défaut : {FICHIER_REGLES} à côté des .sor s'il existe, "
+                                         "sinon les contrôles standard)")
+    parser.add_argument('--modele-regles', metavar='FICHIER',
+                        help="Ecrit le jeu de règles standard avec tous ses seuils, à adapter par projet, puis quitte")
+    parser.add_argument('--profil', action='store_true',
+                        help="Journal des durées, pics mémoire et volumes par étape (<rapport>_profil.json/.csv) ; "
+                             "côté interface : variable d'environnement ARGOS_PROFIL=1")
+    parser.add_argument('--par-dossier', action='store_true', help="Un rapport par dossier de .sor au lieu d'un rapport global")
+    parser.add_argument('--jobs', type=int, default=1, help="Nombre de dossiers traités en parallèle avec --par-dossier")
+    parser.add_argument('--recursif', action='store_true',
+                        help="Parcourt aussi les sous-dossiers (un par site) ; avec --par-dossier, un rapport par site")
+    parser.add_argument('--lectures', type=int, default=LECTURES_SIMULTANEES,
+                        help="Fichiers et dossiers lus simultanément, à augmenter sur un partage réseau "
+                             "(défaut : %(default)s)")
+    parser.add_argument('--surveiller', action='store_true',
+                        help="Service : surveille les dossiers indiqués et tient le rapport à jour à chaque dépôt de .sor")
+    parser.add_argument('--intervalle', type=float, default=INTERVALLE_SURVEILLANCE_S,
+                        help="Secondes entre deux passages de la surveillance (défaut : %(default)s)")
+    parser.add_argument('--projet', metavar='BASE',
+                        help="Base SQLite du projet : chaque livraison y est ajoutée et contrôlée avec les précédentes "
+                             "(longueurs, doublons, temps de mesure, sens opposés) ; sans chemin, rapport de tout "
+                             "le projet. Côté interface : variable d'environnement ARGOS_PROJET")
+    args = parser.parse_args(argv)
+
+    if args.modele_regles:
+        with open(args.modele_regles, 'w', encoding='utf-8') as f:
+            json.dump({
+                'paralleles': JEU_REGLES_DEFAUT['paralleles'],
+                'processus': JEU_REGLES_DEFAUT['processus'],
+                'regles': [
+                    {'regle': nom, **{cle: val for cle, val in parametres.items() if cle not in PARAMETRES_APPEL}}
+                    for nom, _, parametres in preparer_regles(JEU_REGLES_DEFAUT)
+                ]
+            }, f, ensure_ascii=False, indent=2)
+        print(f"✅ Modèle de règles : {args.modele_regles}")
+        return 0
+    if not args.chemins and not args.projet:
+        parser.error("indiquer au moins un dossier ou fichier .sor")
+    try:
+        regles = charger_regles(args.regles) if args.regles else None
+    except (OSError, ValueError) as e:
+        print(f"❌ Jeu de règles invalide : {e}", file=sys.stderr)
+        return 2
+    if not args.chemins:
+        if not os.path.isfile(args.projet):
+            print(f"❌ Base projet introuvable : {args.projet}", file=sys.stderr)
+            return 2
+        sortie = args.sortie or os.path.splitext(args.projet)[0] + '_rapport.xlsx'
+        try:
+            df_params, _, df_hors_normes = analyser_projet(
+                args.projet, sortie, args.indice, args.impulsion, SuiviConsole(), format_sortie=args.format,
+                profil=Profilage() if args.profil else None, regles=regles
+            )
+        except (sqlite3.Error, OSError, ValueError) as e:
+            print(f"❌ Erreur : {e}", file=sys.stderr)
+            return 1
+        print(f"✅ Projet : {len(df_params)} fichiers, {len(df_hors_normes)} lignes hors normes : "
+              f"{', '.join(chemins_rapport(sortie, args.format))}", flush=True)
+        return 0
+    if args.surveiller:
+        if args.par_dossier or not all(os.path.isdir(chemin) for chemin in args.chemins):
+            parser.error("--surveiller attend un ou plusieurs dossiers, sans --par-dossier")
+        if args.projet:
+            parser.error("--projet ne s'utilise pas avec --surveiller")
+        service = Surveillance(
+            args.chemins, args.sortie or os.path.join(args.chemins[0], 'rapport_otdr_final.xlsx'), args.indice,
+            args.impulsion, format_sortie=args.format, regles=regles, intervalle=args.intervalle,
+            recursif=args.recursif, lectures=args.lectures
+        )
+        try:
+            service.executer()
+        except KeyboardInterrupt:
+            print("⏹️ Surveillance arrêtée.", flush=True)
+        return 0
+    sor_files = lister_sor(args.chemins, args.recursif, args.lectures)
+    if not sor_files:
+        print("❌ Aucun fichier .sor trouvé.", file=sys.stderr)
+        return 2
+    if args.par_dossier:
+        lots = defaultdict(list)
+        for sor_file in sor_files:
+            lots[os.path.dirname(sor_file)].append(sor_file)
+        taches = []
+        for dossier, fichiers in lots.items():
+            if args.sortie:
+                os.makedirs(args.sortie, exist_ok=True)
+                sortie = os.path.join(args.sortie, f"{os.path.basename(dossier)}_rapport_otdr_final.xlsx")
+            else:
+                sortie = os.path.join(dossier, 'rapport_otdr_final.xlsx')
+            taches.append((fichiers, sortie, f"[{os.path.basename(dossier)}] "))
+    else:
+        sortie = args.sortie or os.path.join(os.path.dirname(sor_files[0]), 'rapport_otdr_final.xlsx')
+        taches = [(sor_files, sortie, "")]
+
+    jobs = max(1, min(args.jobs, len(taches)))
+    if args.projet:
+        # Chaque dossier est contrôlé avec ceux déjà enregistrés dans la base : livraisons traitées l'une après l'autre
+        jobs = 1
+    # Les dossiers traités en parallèle se partagent les coeurs pour le décodage
+    nb_workers = max(1, (os.cpu_count() or 1) // jobs)
+    def executer(tache):
+        fichiers, sortie, prefixe = tache
+        try:
+            _, _, df_hors_normes = analyser_sor(
+                fichiers, sortie, args.indice, args.impulsion, SuiviConsole(prefixe),
+                nb_workers=nb_workers, format_sortie=args.format, profil=Profilage() if args.profil else None,
+                regles=regles, lectures=args.lectures, projet=args.projet
+            )
+            print(f"{prefixe}✅ {len(fichiers)} fichiers, {len(df_hors_normes)} lignes hors normes : "
+                  f"{', '.join(chemins_rapport(sortie, args.format))}", flush=True)
+            return True
+        except Exception as e:
+            print(f"{prefixe}❌ Erreur : {e}", file=sys.stderr, flush=True)
+            return False
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        resultats = list(pool.map(executer, taches))
+    return 0 if all(resultats) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
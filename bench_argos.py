@@ -0,0 +1,270 @@
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import subprocess
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from argos_moteur import (
+    Profilage, MagasinTraces, construire_dataframes, finaliser_tables, ajouter_metriques, apparier_bidirectionnel,
+    preparer_regles, appliquer_regles, exporter_rapport, charger_regles, FORMATS_SORTIE, JEU_REGLES_DEFAUT
+)
+
+TAILLES_DEFAUT = [100, 1000, 10000, 100000]
+# Modules importés au lancement : le lanceur avant l'ouverture de la fenêtre, le moteur en arrière-plan
+MODULES_DEMARRAGE = [('demarrage', 'ARGOS_COMPLETUDE_v2'), ('import_moteur', 'argos_moteur')]
+REFERENCE_DEFAUT = 'bench_reference.json'
+INDICES = {'1310': '1.467500', '1550': '1.468000'}
+PENTES = {'1310': (0.32, 0.38), '1550': (0.18, 0.24)}
+
+def date_sor(dt):
+    # Même forme que le champ date/time renvoyé par pyotdr
+    return f"{dt.strftime('%a %b %d %H:%M:%S %Y')} ({int(dt.timestamp())} sec)"
+
+def epissures_synthetiques(alea, longueur_km):
+    # (distance, perte vraie, écart) : perte vraie centrée sous le seuil de 0.3 dB, l'écart (diamètres de mode
+    # différents) s'ajoute dans un sens et se retranche dans l'autre (gainer / loser)
+    nb_epissures = alea.randint(1, 6)
+    return [
+        (longueur_km * (i + 1) / (nb_epissures + 1), max(0.0, alea.gauss(0.15, 0.08)), alea.uniform(-0.12, 0.12))
+        for i in range(nb_epissures)
+    ]
+
+def evenements_synthetiques(alea, epissures, fin_km, retour=False):
+    types = [('1F9999LS {auto} reflection', 0.0, 0.0)]
+    for distance, perte, ecart in epissures:
+        if retour:
+            types.append(('0F9999LS {auto} loss/drop/gain', fin_km - distance + alea.uniform(-0.003, 0.003), perte - ecart))
+        else:
+            types.append(('0F9999LS {auto} loss/drop/gain', distance, perte + ecart))
+    types = [types[0]] + sorted(types[1:], key=lambda t: t[1])
+    types.append(('1E9999LS {auto} reflection', fin_km, 0.0))
+    events = []
+    for i, (code, distance, perte) in enumerate(types):
+        events.append({
+            'distance': f"{distance:.3f}", 'refl loss': f"{alea.uniform(-65, -40):.3f}",
+            'slope': f"{alea.uniform(0.18, 0.35):.3f}", 'splice loss': f"{perte:.3f}", 'type': code,
+            'Event ID': str(i + 1)
+        })
+    return events
+
+def trace_synthetique(alea, nom, cable, fibre, lambda_nm, instant, longueur_km, epissures, retour=False):
+    ecart_km = alea.uniform(0.031, 0.2) if alea.random() < 0.01 else alea.uniform(0, 0.02)
+    params = {
+        'Fichier': nom,
+        'filename': nom if alea.random() > 0.01 else nom.replace('_F', '_f0'),
+        'loss end': round(longueur_km + ecart_km, 6),
+        'date/time': date_sor(instant),
+        'index': INDICES[lambda_nm] if alea.random() > 0.02 else '1.470000',
+        'pulse width': '30 ns' if alea.random() > 0.03 else '100 ns',
+        'range': longueur_km * 1.5,
+        'wavelength': f"{lambda_nm} nm",
+        'cable ID': f"CAB{cable:05d}", 'fiber ID': str(fibre),
+        'location A': 'PBO' if retour else 'NRO', 'location B': 'NRO' if retour else 'PBO',
+        'operator': 'Tech', 'comments': '',
+        'OTDR': 'FTB', 'module': 'mod', 'module S/N': 'MSN', 'other': '',
+        'software': '1.0', 'supplier': 'EXFO'
+    }
+    events = evenements_synthetiques(alea, epissures, longueur_km + ecart_km, retour)
+    for event in events:
+        event['Fichier'] = nom
+        event['filename'] = params['filename']
+    return params, events
+
+def traces_synthetiques(nb_traces, graine=0):
+    # Lignes (params, events) de la forme produite par lignes_trace : câbles de 12 fibres mesurées
+    # en 1310 et 1550 dans les deux sens, reprises _N, horodatages dupliqués, indices/impulsions/nommages
+    # parfois faux, quelques sens retour manquants ou incomplets
+    alea = random.Random(graine)
+    debut = datetime(2024, 3, 4, 8, 0, 0)
+    produites = 0
+    cable = 0
+    while produites < nb_traces:
+        longueur_km = alea.uniform(0.5, 25.0)
+        instant = debut + timedelta(hours=cable)
+        for fibre in range(1, 13):
+            for lambda_nm in ('1310', '1550'):
+                epissures = epissures_synthetiques(alea, longueur_km)
+                reprises = 1 + (alea.random() < 0.08) + (alea.random() < 0.02)
+                for reprise in range(reprises):
+                    if produites >= nb_traces:
+                        return
+                    nom = f"CAB{cable:05d}_F{fibre:02d}_{lambda_nm}nm" + (f"_{reprise + 1}" if reprise else "") + ".sor"
+                    # Reprise enregistrée dans la même seconde : doublon ou mesure trop rapprochée
+                    if not reprise or alea.random() < 0.5:
+                        instant += timedelta(seconds=alea.choice([0, 45, 120, 200]) if reprise else alea.randint(100, 400))
+                    produites += 1
+                    yield trace_synthetique(alea, nom, cable, fibre, lambda_nm, instant, longueur_km, epissures)
+                if produites >= nb_traces:
+                    return
+                if alea.random() < 0.02:
+                    continue
+                retour = epissures[1:] if alea.random() < 0.01 else epissures
+                nom = f"CAB{cable:05d}_F{fibre:02d}_{lambda_nm}nm_BA.sor"
+                produites += 1
+                yield trace_synthetique(alea, nom, cable, fibre, lambda_nm, instant + timedelta(hours=6), longueur_km,
+                                        retour, retour=True)
+        cable += 1
+
+def niveaux_synthetiques(alea, events, lambda_nm, pas_km=0.0025):
+    # Rétrodiffusion décroissante, marches aux épissures déclarées (parfois une de plus, non déclarée),
+    # plancher de bruit après la fin de fibre
+    fin_km = float(events[-1]['distance'])
+    abscisses = np.arange(int(fin_km * 1.2 / pas_km) + 20) * pas_km
+    niveaux = 28.0 - alea.uniform(*PENTES[lambda_nm]) * abscisses
+    marches = [(float(e['distance']), float(e['splice loss'])) for e in events if e['type'].startswith('0F')]
+    if alea.random() < 0.05:
+        marches.append((alea.uniform(0.1, 0.9) * fin_km, alea.uniform(0.2, 0.6)))
+    for distance, perte in marches:
+        niveaux[abscisses >= distance] -= perte
+    niveaux[abscisses > fin_km] = 1.0
+    return pas_km, (niveaux + alea.normal(0, 0.01, len(niveaux))).astype(np.float32)
+
+def mesurer_lot(nb_traces, format_sortie='xlsx', graine=0, jeu_regles=JEU_REGLES_DEFAUT, avec_traces=False):
+    traces = list(traces_synthetiques(nb_traces, graine))
+    magasin = MagasinTraces() if avec_traces else None
+    try:
+        if avec_traces:
+            alea = np.random.default_rng(graine)
+            for rang, (params, events) in enumerate(traces):
+                magasin.ajouter(rang, niveaux_synthetiques(alea, events, params['wavelength'].split()[0]))
+        profil = Profilage()
+        with profil.etape('construction') as mesure:
+            df_params, df_events = construire_dataframes(traces)
+            mesure['lignes'] = len(df_params)
+        del traces
+        with profil.etape('preparation') as mesure:
+            df_params, df_events = finaliser_tables(df_params, df_events)
+            mesure['lignes'] = len(df_params)
+        with profil.etape('metriques') as mesure:
+            df_params = ajouter_metriques(df_params, df_events, magasin)
+            mesure['lignes'] = len(magasin.rangs) if magasin is not None else 0
+        with profil.etape('appariement') as mesure:
+            df_params, df_events = apparier_bidirectionnel(df_params, df_events)
+            mesure['lignes'] = int((df_params['Fichier opposé'] != '').sum())
+    finally:
+        # Passe interrompue : le fichier temporaire des niveaux est supprimé comme dans analyser_sor
+        if magasin is not None:
+            magasin.fermer()
+    df_hors_normes = appliquer_regles(
+        df_params, df_events, preparer_regles(jeu_regles), jeu_regles.get('paralleles', 1), profil=profil,
+        processus=jeu_regles.get('processus', 1)
+    )
+    with tempfile.TemporaryDirectory() as dossier:
+        with profil.etape('export') as mesure:
+            exporter_rapport(os.path.join(dossier, 'rapport.xlsx'), df_params, df_events, df_hors_normes, format_sortie)
+            mesure['lignes'] = len(df_params) + len(df_events) + len(df_hors_normes)
+    mesures = {m['etape']: m for m in profil.mesures}
+    mesures['rapport_complet'] = {
+        'etape': 'rapport_complet', 'lignes': len(df_hors_normes),
+        'duree_s': round(time.perf_counter() - profil.debut, 4),
+        'pic_rss_mo': max((m['pic_rss_mo'] or 0) for m in profil.mesures) or None
+    }
+    return mesures
+
+def mesurer_demarrage(repetitions=3):
+    # Import de chaque module dans un interpréteur neuf, meilleure durée retenue ; lignes = modules chargés
+    script = ("import sys, time; avant = len(sys.modules); debut = time.perf_counter(); import {}; "
+              "print(time.perf_counter() - debut, len(sys.modules) - avant, 'pandas' in sys.modules)")
+    resultats = []
+    for etape, module in MODULES_DEMARRAGE:
+        durees = []
+        for _ in range(repetitions):
+            sortie = subprocess.run(
+                [sys.executable, '-c', script.format(module)], capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout.split()
+            durees.append(float(sortie[0]))
+        resultats.append({
+            'taille': 0, 'etape': etape, 'duree_s': round(min(durees), 4), 'lignes': int(sortie[1]), 'pic_rss_mo': None
+        })
+        if etape == 'demarrage' and sortie[2] == 'True':
+            print("⚠️ pandas est chargé par le lanceur : la fenêtre attend le moteur pour s'ouvrir", file=sys.stderr)
+    print(f"Démarrage : lanceur en {resultats[0]['duree_s']:.3f} s, moteur en {resultats[1]['duree_s']:.3f} s", flush=True)
+    return pd.DataFrame(resultats)
+
+def executer_bench(tailles, repetitions=3, format_sortie='xlsx', jeu_regles=JEU_REGLES_DEFAUT, avec_traces=False):
+    # Meilleure durée sur plusieurs passes : moins sensible au bruit de la machine
+    resultats = []
+    for taille in tailles:
+        meilleures = {}
+        for _ in range(repetitions):
+            for etape, mesure in mesurer_lot(taille, format_sortie, jeu_regles=jeu_regles, avec_traces=avec_traces).items():
+                if etape not in meilleures or mesure['duree_s'] < meilleures[etape]['duree_s']:
+                    meilleures[etape] = mesure
+        for etape, mesure in meilleures.items():
+            resultats.append({
+                'taille': taille, 'etape': etape, 'duree_s': mesure['duree_s'],
+                'lignes': mesure['lignes'], 'pic_rss_mo': mesure['pic_rss_mo']
+            })
+        print(f"{taille} traces : rapport complet en {meilleures['rapport_complet']['duree_s']:.3f} s", flush=True)
+    return pd.DataFrame(resultats)
+
+def comparer_reference(df_resultats, reference, ratio_max, duree_min=0.05):
+    # Régression : durée > ratio_max x référence, hors étapes trop courtes pour être mesurées finement
+    df_ref = pd.DataFrame(reference['mesures'])[['taille', 'etape', 'duree_s']]
+    df = df_resultats.merge(df_ref, on=['taille', 'etape'], how='left', suffixes=('', '_ref'))
+    df['ratio'] = (df['duree_s'] / df['duree_s_ref']).round(2)
+    df['regression'] = (df['ratio'] > ratio_max) & (df[['duree_s', 'duree_s_ref']].max(axis=1) >= duree_min)
+    return df
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Bench ARGOS hors ligne : lots OTDR synthétiques, durée de chaque contrôle et du rapport complet."
+    )
+    parser.add_argument('--tailles', type=int, nargs='+', default=TAILLES_DEFAUT,
+                        help="Nombres de traces par lot (défaut : %(default)s)")
+    parser.add_argument('--repetitions', type=int, default=3, help="Passes par taille, la meilleure est retenue")
+    parser.add_argument('--format', choices=FORMATS_SORTIE, default='xlsx', help="Format du rapport exporté")
+    parser.add_argument('--regles', help="Jeu de règles à mesurer (défaut : contrôles standard)")
+    parser.add_argument('--traces', action='store_true',
+                        help="Ajoute des traces brutes synthétiques (~40 Ko chacune sur disque) et mesure leurs métriques")
+    parser.add_argument('--reference', default=REFERENCE_DEFAUT, help="Durées de référence (défaut : %(default)s)")
+    parser.add_argument('--enregistrer', action='store_true', help="Remplace la référence par les mesures de ce passage")
+    parser.add_argument('--ratio', type=float, default=1.5,
+                        help="Echec si une étape dépasse ce multiple de sa durée de référence (défaut : %(default)s)")
+    parser.add_argument('--duree-min', type=float, default=0.05,
+                        help="Etapes ignorées si elles durent moins de tant de secondes (défaut : %(default)s)")
+    parser.add_argument('--sortie', help="CSV des mesures de ce passage")
+    args = parser.parse_args(argv)
+
+    jeu_regles = charger_regles(args.regles) if args.regles else JEU_REGLES_DEFAUT
+    df_resultats = pd.concat([
+        mesurer_demarrage(max(1, args.repetitions)),
+        executer_bench(args.tailles, max(1, args.repetitions), args.format, jeu_regles, args.traces)
+    ], ignore_index=True)
+    if args.sortie:
+        df_resultats.to_csv(args.sortie, index=False, encoding='utf-8')
+    if args.enregistrer:
+        with open(args.reference, 'w', encoding='utf-8') as f:
+            json.dump({
+                'date': datetime.now().isoformat(timespec='seconds'), 'format': args.format,
+                'mesures': df_resultats.to_dict('records')
+            }, f, ensure_ascii=False, indent=2)
+        print(df_resultats.to_string(index=False))
+        print(f"✅ Référence enregistrée : {args.reference}")
+        return 0
+    if not os.path.exists(args.reference):
+        print(df_resultats.to_string(index=False))
+        print(f"ℹ️ Pas de référence ({args.reference}) : relancer avec --enregistrer pour en créer une.")
+        return 0
+    with open(args.reference, encoding='utf-8') as f:
+        reference = json.load(f)
+    df = comparer_reference(df_resultats, reference, args.ratio, args.duree_min)
+    print(df[['taille', 'etape', 'lignes', 'duree_s', 'duree_s_ref', 'ratio', 'pic_rss_mo']].to_string(index=False))
+    regressions = df[df['regression']]
+    if not regressions.empty:
+        for _, ligne in regressions.iterrows():
+            print(f"❌ {ligne['etape']} ({ligne['taille']} traces) : {ligne['duree_s']:.3f} s, "
+                  f"x{ligne['ratio']} la référence", file=sys.stderr)
+        return 1
+    print(f"✅ Aucune étape au-delà de x{args.ratio} la référence.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argos_moteur as moteur
+
+# Courbes A->B / B->A écrites à la main sous la forme produite par lignes_trace : câble C1, fibre de 5 km
+
+FIN_KM = 5.0
+
+def trace(nom, fibre, retour, epissures, cable='C1', lambda_nm='1310'):
+    # epissures : [(distance depuis l'origine de la mesure en km, perte en dB)]
+    params = {
+        'Fichier': nom, 'filename': nom, 'loss end': FIN_KM,
+        'date/time': f"Mon Mar 04 {9 if retour else 8:02d}:00:00 2024 (0 sec)",
+        'index': '1.467500', 'pulse width': '30 ns', 'range': 7.5, 'wavelength': f"{lambda_nm} nm",
+        'cable ID': cable, 'fiber ID': str(fibre),
+        'location A': 'PBO' if retour else 'NRO', 'location B': 'NRO' if retour else 'PBO',
+    }
+    codes = [('1F9999LS', 0.0, 0.0)] + [('0F9999LS', d, p) for d, p in epissures] + [('1E9999LS', FIN_KM, 0.0)]
+    events = [
+        {'Fichier': nom, 'filename': nom, 'Event ID': str(k + 1), 'type': code, 'distance': f"{distance:.3f}",
+         'splice loss': f"{perte:.3f}", 'refl loss': '-50.000', 'slope': '0.330'}
+        for k, (code, distance, perte) in enumerate(codes)
+    ]
+    return params, events
+
+def analyser(traces, regles=('epissures', 'mesure_opposee', 'epissures_non_appariees')):
+    df_params, df_events = moteur.construire_dataframes(traces)
+    df_params, df_events = moteur.finaliser_tables(df_params, df_events)
+    df_params, df_events = moteur.apparier_bidirectionnel(df_params, df_events)
+    entrees = moteur.preparer_regles({'regles': list(regles)})
+    return df_params, df_events, moteur.appliquer_regles(df_params, df_events, entrees)
+
+def anomalies(df_hors_normes, anomalie):
+    if df_hors_normes.empty:
+        return []
+    return sorted(df_hors_normes.loc[df_hors_normes['Anomalie'] == anomalie, 'Fichier'])
+
+def epissures(df_events, fichier):
+    lignes = (df_events['Fichier'] == fichier) & (df_events["Type d'évenements"] == "Epissure")
+    return df_events.loc[lignes, 'Atténuation bidir.(dB)'].to_numpy()
+
+def test_moyenne_sous_le_seuil():
+    # 0.35 dB dans un sens, 0.15 dB dans l'autre (gainer / loser) : 0.25 dB en moyenne, pas d'anomalie
+    df_params, df_events, df_hors_normes = analyser([
+        trace('C1_F01.sor', 1, False, [(2.0, 0.35)]),
+        trace('C1_F01_BA.sor', 1, True, [(FIN_KM - 2.0, 0.15)]),
+    ])
+    assert list(df_params['Fichier opposé']) == ['C1_F01_BA.sor', 'C1_F01.sor']
+    np.testing.assert_allclose(epissures(df_events, 'C1_F01.sor'), [0.25])
+    np.testing.assert_allclose(epissures(df_events, 'C1_F01_BA.sor'), [0.25])
+    assert df_hors_normes.empty
+
+def test_epissure_mauvaise_dans_les_deux_sens():
+    df_params, df_events, df_hors_normes = analyser([
+        trace('C1_F01.sor', 1, False, [(2.0, 0.45)]),
+        trace('C1_F01_BA.sor', 1, True, [(FIN_KM - 2.0, 0.40)]),
+    ])
+    np.testing.assert_allclose(epissures(df_events, 'C1_F01.sor'), [0.425])
+    assert anomalies(df_hors_normes, "Epissure NOK") == ['C1_F01.sor', 'C1_F01_BA.sor']
+    assert anomalies(df_hors_normes, "Epissure non appariée") == []
+
+def test_epissure_hors_tolerance():
+    # 50 m d'écart une fois ramené dans le même repère (tolérance 20 m) : pas de moyenne, chaque sens
+    # est contrôlé sur sa propre perte et l'épissure est signalée non appariée des deux côtés
+    df_params, df_events, df_hors_normes = analyser([
+        trace('C1_F01.sor', 1, False, [(2.0, 0.35)]),
+        trace('C1_F01_BA.sor', 1, True, [(FIN_KM - 2.05, 0.15)]),
+    ])
+    assert np.isnan(epissures(df_events, 'C1_F01.sor')).all()
+    assert anomalies(df_hors_normes, "Epissure NOK") == ['C1_F01.sor']
+    assert anomalies(df_hors_normes, "Epissure non appariée") == ['C1_F01.sor', 'C1_F01_BA.sor']
+
+def test_sens_oppose_manquant():
+    # Fibre 2 mesurée dans un seul sens sur un câble mesuré dans les deux : signalée
+    df_params, df_events, df_hors_normes = analyser([
+        trace('C1_F01.sor', 1, False, [(2.0, 0.1)]),
+        trace('C1_F01_BA.sor', 1, True, [(FIN_KM - 2.0, 0.1)]),
+        trace('C1_F02.sor', 2, False, [(2.0, 0.1)]),
+    ])
+    assert list(df_params['Fichier opposé']) == ['C1_F01_BA.sor', 'C1_F01.sor', '']
+    assert anomalies(df_hors_normes, "Mesure sens opposé manquante") == ['C1_F02.sor']
+
+def test_mesure_la_plus_recente_appariee():
+    # Sens retour mesuré deux fois : l'aller est apparié à la mesure la plus récente
+    ancienne = trace('C1_F01_BA.sor', 1, True, [(FIN_KM - 2.0, 0.1)])
+    recente = trace('C1_F01_BA_2.sor', 1, True, [(FIN_KM - 2.0, 0.1)])
+    recente[0]['date/time'] = "Mon Mar 04 10:00:00 2024 (0 sec)"
+    df_params, _, _ = analyser([trace('C1_F01.sor', 1, False, [(2.0, 0.1)]), ancienne, recente])
+    assert df_params.set_index('Fichier').loc['C1_F01.sor', 'Fichier opposé'] == 'C1_F01_BA_2.sor'
@@ -0,0 +1,96 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argos_moteur as moteur
+
+# Résultat pyotdr d'un .sor (format 2, tous les champs des blocs), plus des champs propres à un constructeur
+RESULTATS = {
+    'filename': 'CAB1_F01.sor',
+    'GenParams': {
+        'language': 'EN', 'cable ID': 'CAB1', 'fiber ID': '1', 'fiber type': 'G.652 (standard SMF)',
+        'wavelength': '1310 nm', 'location A': 'NRO', 'location B': 'PBO', 'cable code/fiber type': '',
+        'build condition': 'BC (as-built)', 'user offset': '0', 'user offset distance': '0', 'operator': 'Tech',
+        'comments': 'RAS'
+    },
+    'SupParams': {
+        'supplier': 'EXFO', 'OTDR': 'FTB', 'OTDR S/N': '123', 'module': 'mod', 'module S/N': 'MSN',
+        'software': '1.0', 'other': ''
+    },
+    'FxdParams': {
+        'date/time': 'Mon Mar 04 08:00:00 2024 (1709539200 sec)', 'unit': 'km (kilometers)', 'wavelength': '1310.0 nm',
+        'acquisition offset': -1400, 'acquisition offset distance': -286, 'number of pulse width entries': 1,
+        'pulse width': '30 ns', 'sample spacing': '2.5 usec', 'num data points': 30000, 'index': '1.467500',
+        'BC': '-81.87 dB', 'num averages': 1, 'averaging time': '15 sec', 'range': 7.5,
+        'acquisition range distance': 10000, 'front panel offset': 2800, 'noise floor level': 0,
+        'noise floor scaling factor': 1000, 'power offset first point': 0, 'loss thr': '0.020 dB',
+        'refl thr': '-65.000 dB', 'EOT thr': '3.000 dB', 'trace type': 'ST[standard trace]', 'X1': 0, 'Y1': 0,
+        'X2': 0, 'Y2': 0, 'resolution': 0.25, 'gain mode': 'auto'
+    },
+    'KeyEvents': {
+        'num events': 2,
+        'event 1': {
+            'type': '1F9999LS {auto} reflection', 'distance': '0.000', 'slope': '0.000', 'splice loss': '0.000',
+            'refl loss': '-50.000', 'end of prev': '0.000', 'start of curr': '0.000', 'end of curr': '0.010',
+            'start of next': '0.010', 'peak': '0.000', 'comments': ''
+        },
+        'event 2': {
+            'type': '1E9999LS {auto} reflection', 'distance': '5.000', 'slope': '0.330', 'splice loss': '0.000',
+            'refl loss': '-40.000', 'end of prev': '4.990', 'start of curr': '5.000', 'end of curr': '5.010',
+            'start of next': '5.010', 'peak': '5.000', 'comments': '', 'Type de ROP': 'A'
+        },
+        'Summary': {'total loss': 1.65, 'ORL': 30.0, 'loss start': 0.0, 'loss end': 5.0, 'ORL start': 0.0}
+    }
+}
+
+# Colonnes de la version d'origine, reprises telles quelles : tout champ pyotdr sauf ceux-ci arrivait au rapport
+colonnes_a_supprimer_params = [
+    'BC', 'EOT thr', 'X1', 'X2', 'Y1', 'Y2',
+    'acquisition offset', 'acquisition offset distance',
+    'averaging time', 'front panel offset', 'loss thr',
+    'noise floor level', 'num averages', 'num data points',
+    'number of pulse width entries', 'power offset first point',
+    'refl thr', 'resolution', 'sample spacing', 'trace type',
+    'unit', 'build condition', 'cable code/fiber type',
+    'fiber type', 'language', 'user offset', 'user offset distance',
+    'noise floor scaling factor', 'acquisition range distance', 'OTDR S/N'
+]
+colonnes_a_supprimer_events = [
+    'comments', 'end of curr', 'end of prev', 'peak', 'start of curr', 'start of next', 'Type de ROP'
+]
+
+def tables_origine(data, fichier_sor):
+    nom_sor = data.get('filename', fichier_sor)
+    key_events_summary = data.get('KeyEvents', {}).get('Summary', {})
+    params = {
+        'Fichier': fichier_sor,
+        'filename': nom_sor,
+        'loss end': key_events_summary.get('loss end', None),
+        **data.get('FxdParams', {}),
+        **data.get('GenParams', {}),
+        **data.get('SupParams', {})
+    }
+    all_events = []
+    key_events = data.get('KeyEvents', {})
+    for key in key_events:
+        if key.lower().startswith('event '):
+            event_copy = key_events[key].copy()
+            event_copy['Fichier'] = fichier_sor
+            event_copy['filename'] = nom_sor
+            event_copy['Event ID'] = key.split()[1]
+            all_events.append(event_copy)
+    df_params = pd.DataFrame([params]).drop(columns=colonnes_a_supprimer_params, errors='ignore')
+    df_events = pd.DataFrame(all_events).drop(columns=colonnes_a_supprimer_events, errors='ignore')
+    return df_params, df_events
+
+def test_champs_du_rapport_conserves():
+    attendu_params, attendu_events = tables_origine(RESULTATS, 'CAB1_F01.sor')
+    params, events = moteur.lignes_trace(RESULTATS, 'CAB1_F01.sor')
+    obtenu_params, obtenu_events = pd.DataFrame([params]), pd.DataFrame(events)
+    # Mêmes colonnes dans le même ordre, champ constructeur compris ; champs écartés absents
+    pd.testing.assert_frame_equal(obtenu_params, attendu_params)
+    pd.testing.assert_frame_equal(obtenu_events, attendu_events)
+    assert 'gain mode' in params and 'front panel offset' not in params
@@ -0,0 +1,59 @@
+import os
+import random
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argos_moteur as moteur
+from bench_argos import traces_synthetiques
+
+# Livraisons successives d'un projet : le décodage des .sor est remplacé par les traces synthétiques du même nom
+
+TRACES = {params['Fichier']: (params, events) for params, events in traces_synthetiques(600, 3)}
+
+@pytest.fixture
+def traces_synthetiques_decodees(monkeypatch):
+    def iterer_traces(sor_files, *args, **kwargs):
+        for chemin in sor_files:
+            yield chemin, TRACES[os.path.basename(chemin)]
+    monkeypatch.setattr(moteur, 'iterer_traces', iterer_traces)
+    monkeypatch.setattr(moteur, 'ouvrir_cache', lambda: None)
+
+def en_texte(df):
+    df = df.astype(object).where(df.notna(), '').astype(str)
+    return df[sorted(df.columns)].reset_index(drop=True)
+
+def comparer(obtenu, attendu):
+    for df_obtenu, df_attendu in zip(obtenu, attendu):
+        pd.testing.assert_frame_equal(en_texte(df_obtenu), en_texte(df_attendu))
+
+def test_deux_livraisons_comme_une_analyse_complete(tmp_path, traces_synthetiques_decodees):
+    chemins = sorted(str(tmp_path / 'sor' / nom) for nom in TRACES)
+    # Livraisons tirées au hasard : câbles et NomBase répartis sur les deux
+    alea = random.Random(2)
+    premiere = sorted(alea.sample(chemins, len(chemins) // 2))
+    seconde = sorted(set(chemins) - set(premiere))
+    base = str(tmp_path / 'projet.db')
+    moteur.analyser_sor(premiere, str(tmp_path / 'l1.xlsx'), format_sortie='csv', projet=base)
+    _, _, hors_normes_seconde = moteur.analyser_sor(seconde, str(tmp_path / 'l2.xlsx'), format_sortie='csv', projet=base)
+    complet = moteur.analyser_sor(chemins, str(tmp_path / 'complet.xlsx'), format_sortie='csv')
+    comparer(moteur.analyser_projet(base, str(tmp_path / 'projet.xlsx'), format_sortie='csv'), complet)
+    # La seconde livraison est contrôlée avec la première : ses doublons avec des courbes déjà livrées sont signalés
+    doublons = complet[2][complet[2]['Anomalie'] == "Courbes en doublons"].reset_index(drop=True)
+    fichiers_seconde = {os.path.basename(chemin) for chemin in seconde}
+    croises = doublons.groupby(doublons.index // 2)['Fichier'].agg(set)
+    croises = [paire for paire in croises if paire & fichiers_seconde and paire - fichiers_seconde]
+    assert croises
+    signales = set(hors_normes_seconde.loc[hors_normes_seconde['Anomalie'] == "Courbes en doublons", 'Fichier'])
+    assert all(paire <= signales for paire in croises)
+
+def test_relivraison_remplace_la_courbe(tmp_path, traces_synthetiques_decodees):
+    chemins = sorted(str(tmp_path / 'sor' / nom) for nom in TRACES)
+    base = str(tmp_path / 'projet.db')
+    moteur.analyser_sor(chemins[:400], str(tmp_path / 'l1.xlsx'), format_sortie='csv', projet=base)
+    moteur.analyser_sor(chemins[300:], str(tmp_path / 'l2.xlsx'), format_sortie='csv', projet=base)
+    complet = moteur.analyser_sor(chemins, str(tmp_path / 'complet.xlsx'), format_sortie='csv')
+    comparer(moteur.analyser_projet(base, str(tmp_path / 'projet.xlsx'), format_sortie='csv'), complet)
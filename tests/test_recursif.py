@@ -0,0 +1,71 @@
+import os
+import random
+import sys
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argos_moteur as moteur
+from bench_argos import trace_synthetique
+
+# Parcours récursif d'une livraison par site : F001.sor mesuré sur 1 km au site 1 et sur 5 km au site 2 (à 20 m
+# près, fin de fibre synthétique). Le décodage des .sor est remplacé par la trace synthétique du site
+
+LONGUEURS_KM = {'site1': 1.0, 'site2': 5.0}
+
+def trace_site(chemin):
+    longueur_km = LONGUEURS_KM[os.path.basename(os.path.dirname(chemin))]
+    return trace_synthetique(random.Random(0), 'F001.sor', 1, 1, '1310', datetime(2024, 3, 4, 8), longueur_km, [])
+
+@pytest.fixture
+def traces_par_site(monkeypatch):
+    def iterer_traces(sor_files, *args, **kwargs):
+        for chemin in sor_files:
+            yield chemin, trace_site(chemin)
+    monkeypatch.setattr(moteur, 'iterer_traces', iterer_traces)
+    monkeypatch.setattr(moteur, 'ouvrir_cache', lambda: None)
+
+@pytest.fixture
+def livraison(tmp_path):
+    for site in LONGUEURS_KM:
+        (tmp_path / site).mkdir()
+        (tmp_path / site / 'F001.sor').write_text('x')
+    return tmp_path
+
+def test_homonymes_refuses_dans_un_rapport_unique(livraison, traces_par_site):
+    sor_files = moteur.lister_sor([str(livraison)], recursif=True)
+    assert moteur.homonymes_sor(sor_files) == {'F001.sor': sor_files}
+    with pytest.raises(ValueError, match='F001.sor'):
+        moteur.analyser_sor(sor_files, str(livraison / 'rapport.xlsx'), format_sortie='csv')
+    assert moteur.main([str(livraison), '--recursif', '--format', 'csv']) == 1
+    assert not os.path.exists(livraison / 'site1' / 'rapport_otdr_final_parametres.csv')
+
+def test_un_rapport_par_site(livraison, traces_par_site, tmp_path):
+    sortie = tmp_path / 'rapports'
+    assert moteur.main([str(livraison), '--recursif', '--par-dossier', '--sortie', str(sortie), '--format', 'csv']) == 0
+    for site, longueur_km in LONGUEURS_KM.items():
+        df_params = pd.read_csv(sortie / f"{site}_rapport_otdr_final_parametres.csv")
+        assert list(df_params['Distance Totale(km)']) == [pytest.approx(longueur_km, abs=0.02)]
+
+class SurveillanceSites(moteur.Surveillance):
+    def decoder(self, sor_files):
+        df_params, df_events = moteur.construire_dataframes([trace_site(chemin) for chemin in sor_files])
+        df_params, df_events = moteur.finaliser_tables(df_params, df_events)
+        return moteur.normaliser_colonnes(df_params), df_events
+
+def test_surveillance_ecarte_les_homonymes(livraison, tmp_path):
+    (livraison / 'site2' / 'F001.sor').unlink()
+    surveillance = SurveillanceSites([str(livraison)], str(tmp_path / 'rapport.xlsx'), format_sortie='csv', recursif=True)
+    def distances():
+        surveillance.passage()
+        surveillance.passage()
+        return [round(distance) for distance in moteur.colonne(surveillance.df_params, 'Distance Totale(km)')]
+    assert distances() == [1]
+    # Homonyme déposé sur le second site : aucune des deux courbes n'est gardée plutôt qu'une fusion des deux
+    (livraison / 'site2' / 'F001.sor').write_text('x')
+    assert distances() == []
+    (livraison / 'site1' / 'F001.sor').unlink()
+    assert distances() == [5]
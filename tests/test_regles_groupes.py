@@ -0,0 +1,195 @@
+import os
+import re
+import sys
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argos_moteur as moteur
+
+# Dates illisibles volontaires : pandas prévient qu'il les lit une à une
+pytestmark = pytest.mark.filterwarnings('ignore:Could not infer format')
+
+# Contrôles entre courbes de la version d'origine (câble, NomBase), repris tels quels (sans les messagebox) :
+# référence des règles longueur_fibres, temps_mesures et doublons
+
+def ajouter_anomalies(df_hors_normes, anomalies):
+    if anomalies:
+        df_anomalies = pd.DataFrame(anomalies)
+        colonnes_hn = list(df_hors_normes.columns)
+        for col in df_anomalies.columns:
+            if col not in colonnes_hn:
+                df_hors_normes[col] = ""
+        df_hors_normes = pd.concat([df_hors_normes, df_anomalies], ignore_index=True)
+    return df_hors_normes
+
+def controle_longueur_fibres(df_params, df_hors_normes, tolerance_m=30):
+    anomalies = []
+    tolerance_km = tolerance_m / 1000.0
+    if 'Distance Totale(km)' in df_params.columns:
+        df_params['Distance Totale(km)'] = pd.to_numeric(df_params['Distance Totale(km)'], errors='coerce')
+    if 'cable ID' in df_params.columns:
+        df_params['cable ID'] = df_params['cable ID'].astype(str).str.strip()
+    for cable_id, group in df_params.groupby('cable ID'):
+        if pd.isna(cable_id) or cable_id == '' or group['Distance Totale(km)'].isnull().all():
+            continue
+        dists = group['Distance Totale(km)'].dropna().astype(float)
+        if len(dists) < 2:
+            continue
+        min_dist = dists.min()
+        max_dist = dists.max()
+        if (max_dist - min_dist) > tolerance_km:
+            for idx, row in group.iterrows():
+                anomalies.append({
+                    'Fichier': row.get('Fichier', ''),
+                    'MétaNommage': row.get('MétaNommage', ''),
+                    'Indice de Réfraction': row.get('Indice de Réfraction', ''),
+                    'Impulsion': row.get('Impulsion', ''),
+                    'Lambda': row.get('Lambda', ''),
+                    'cable ID': row.get('cable ID', ''),
+                    'Distance Totale(km)': row.get('Distance Totale(km)', ''),
+                    'Anomalie': "Longueurs d'une même fibres NOK"
+                })
+    return ajouter_anomalies(df_hors_normes, anomalies)
+
+def analyse_temps_mesures(df_params, df_hors_normes):
+    if 'date/time' in df_params.columns:
+        df_params['date/time'] = pd.to_datetime(df_params['date/time'], errors='coerce', dayfirst=True)
+    def nom_base(nom):
+        return re.sub(r'(_\d+)?\.sor$', '.sor', str(nom), flags=re.IGNORECASE)
+    df_params['NomBase'] = df_params['Fichier'].apply(nom_base)
+    anomalies_temps = []
+    for nom, group in df_params.groupby('NomBase'):
+        group_sorted = group.sort_values('date/time')
+        times = group_sorted['date/time'].tolist()
+        fichiers = group_sorted['Fichier'].tolist()
+        metas = group_sorted['MétaNommage'].tolist() if 'MétaNommage' in group_sorted.columns else fichiers
+        lambdas = group_sorted['Lambda'].tolist() if 'Lambda' in group_sorted.columns else [None]*len(group_sorted)
+        for i in range(1, len(times)):
+            lambda_i = str(lambdas[i]).lower().replace('nm', '').replace(' ', '').replace('\xa0', '')
+            lambda_i_1 = str(lambdas[i-1]).lower().replace('nm', '').replace(' ', '').replace('\xa0', '')
+            if (
+                pd.notnull(times[i]) and
+                pd.notnull(times[i-1]) and
+                lambda_i == lambda_i_1
+            ):
+                delta = (times[i] - times[i-1])
+                if delta < timedelta(minutes=1, seconds=30):
+                    for idx in [i-1, i]:
+                        anomalies_temps.append({
+                            'Fichier': fichiers[idx],
+                            'MétaNommage': metas[idx],
+                            'Indice de Réfraction': group_sorted.iloc[idx].get('Indice de Réfraction', ''),
+                            'Impulsion': group_sorted.iloc[idx].get('Impulsion', ''),
+                            'Lambda': group_sorted.iloc[idx].get('Lambda', ''),
+                            'Anomalie': "Temps de mesures <1min 30"
+                        })
+    return ajouter_anomalies(df_hors_normes, anomalies_temps)
+
+def analyser_doublons_courbes(df_params, df_hors_normes):
+    def nom_base(nom):
+        return re.sub(r'(_\d+)?\.sor$', '.sor', str(nom), flags=re.IGNORECASE)
+    if 'NomBase' not in df_params.columns:
+        df_params['NomBase'] = df_params['Fichier'].apply(nom_base)
+    anomalies_doublons = []
+    for nom_base_group, group in df_params.groupby('NomBase'):
+        if len(group) > 1:
+            fichiers_traites = set()
+            for i, row1 in group.iterrows():
+                for j, row2 in group.iterrows():
+                    lambda1 = str(row1.get('Lambda', '')).lower().replace('nm', '').replace(' ', '').replace('\xa0', '')
+                    lambda2 = str(row2.get('Lambda', '')).lower().replace('nm', '').replace(' ', '').replace('\xa0', '')
+                    if (
+                        i < j and
+                        row1['date/time'] == row2['date/time'] and
+                        pd.notnull(row1['date/time']) and
+                        row1['Fichier'] not in fichiers_traites and
+                        row2['Fichier'] not in fichiers_traites and
+                        lambda1 == lambda2
+                    ):
+                        for _, row in [(i, row1), (j, row2)]:
+                            anomalies_doublons.append({
+                                'Fichier': row['Fichier'],
+                                'MétaNommage': row.get('MétaNommage', ''),
+                                'Indice de Réfraction': row.get('Indice de Réfraction', ''),
+                                'Impulsion': row.get('Impulsion', ''),
+                                'Lambda': row.get('Lambda', ''),
+                                'date/time': row.get('date/time', ''),
+                                'Anomalie': "Courbes en doublons"
+                            })
+                        fichiers_traites.add(row1['Fichier'])
+                        fichiers_traites.add(row2['Fichier'])
+    return ajouter_anomalies(df_hors_normes, anomalies_doublons)
+
+# Courbes de quelques câbles : mesures reprises (_2, _3) et fichiers homonymes partageant un NomBase, dates à la
+# minute (égales, à 60 s ou plus loin), dates et distances illisibles, lambdas écrits de plusieurs façons
+LAMBDAS = ['1310', '1550', '1310 nm', '1550nm', '1550\xa0NM', None]
+DISTANCES = ['1.000', '1.010', '1.025', '1.040', '1.1', '', 'abc', None]
+CABLES = ['C1', ' C1', 'C2', 'C3 ', '', None]
+
+def table_aleatoire(graine, nb_lignes=50):
+    alea = np.random.default_rng(graine)
+    debut = pd.Timestamp('2024-03-01 08:00')
+    fichiers, dates = [], []
+    for _ in range(nb_lignes):
+        fichiers.append(f"C{alea.integers(3)}_F{alea.integers(6):02d}{['', '', '_2', '_3'][alea.integers(4)]}.sor")
+        if alea.random() < 0.1:
+            dates.append(['', 'date illisible', None][alea.integers(3)])
+        else:
+            dates.append((debut + pd.Timedelta(minutes=int(alea.integers(6)))).strftime('%d/%m/%Y %H:%M'))
+    return pd.DataFrame({
+        'Fichier': fichiers,
+        'MétaNommage': fichiers,
+        'Indice de Réfraction': '1.4675',
+        'Impulsion': '30',
+        'Lambda': [LAMBDAS[k] for k in alea.integers(len(LAMBDAS), size=nb_lignes)],
+        'cable ID': [CABLES[k] for k in alea.integers(len(CABLES), size=nb_lignes)],
+        'Distance Totale(km)': [DISTANCES[k] for k in alea.integers(len(DISTANCES), size=nb_lignes)],
+        'date/time': dates,
+    }, dtype=object)
+
+def appliquer(nom, df_params):
+    # Comme dans appliquer_regles : conversions de normaliser_colonnes puis colonnes dérivées de la règle
+    df_params = moteur.normaliser_colonnes(df_params.copy())
+    definition = moteur.REGLES[nom]
+    derivees = {derivee: moteur.DERIVEES[derivee](df_params) for derivee in definition['derivees']}
+    return definition['fonction'](df_params, derivees, **definition['parametres'])
+
+def comparer(attendu, obtenu):
+    if attendu.empty:
+        assert obtenu.empty
+        return
+    attendu, obtenu = (df.astype(object).where(df.notna(), None) for df in (attendu, obtenu))
+    pd.testing.assert_frame_equal(attendu, obtenu)
+
+@pytest.mark.parametrize('graine', range(150))
+def test_longueur_fibres(graine):
+    df_params = table_aleatoire(graine)
+    comparer(controle_longueur_fibres(df_params.copy(), pd.DataFrame()), appliquer('longueur_fibres', df_params))
+
+@pytest.mark.parametrize('graine', range(150))
+def test_temps_mesures(graine):
+    df_params = table_aleatoire(graine)
+    comparer(analyse_temps_mesures(df_params.copy(), pd.DataFrame()), appliquer('temps_mesures', df_params))
+
+@pytest.mark.parametrize('graine', range(150))
+def test_doublons(graine):
+    df_params = table_aleatoire(graine)
+    # Dans l'ancien enchaînement, l'analyse temporelle avait déjà converti les dates avant les doublons
+    reference = df_params.copy()
+    reference['date/time'] = pd.to_datetime(reference['date/time'], errors='coerce', dayfirst=True)
+    comparer(analyser_doublons_courbes(reference, pd.DataFrame()), appliquer('doublons', df_params))
+
+def test_doublons_premiere_paire():
+    # Trois mesures identiques : seule la première paire est signalée, la troisième courbe reste seule
+    df_params = pd.DataFrame({
+        'Fichier': ['A.sor', 'A_2.sor', 'A_3.sor'],
+        'Lambda': '1310',
+        'date/time': '01/03/2024 08:00',
+    })
+    obtenu = appliquer('doublons', df_params)
+    assert list(obtenu['Fichier']) == ['A.sor', 'A_2.sor']
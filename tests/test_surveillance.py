@@ -0,0 +1,70 @@
+import os
+import random
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argos_moteur as moteur
+from bench_argos import traces_synthetiques
+
+# Service de surveillance alimenté par des traces synthétiques : les fichiers déposés ne servent qu'à être
+# repérés, leur décodage est remplacé par la trace synthétique du même nom
+
+TRACES = {params['Fichier']: (params, events) for params, events in traces_synthetiques(600, 5)}
+
+class SurveillanceSynthetique(moteur.Surveillance):
+    def decoder(self, sor_files):
+        df_params, df_events = moteur.construire_dataframes([TRACES[os.path.basename(chemin)] for chemin in sor_files])
+        df_params, df_events = moteur.finaliser_tables(df_params, df_events)
+        df_params = moteur.ajouter_metriques(df_params, df_events, None)
+        return moteur.normaliser_colonnes(df_params), df_events
+
+def analyse_complete(noms):
+    # Même enchaînement qu'analyser_sor sur les fichiers présents, triés par nom
+    df_params, df_events = moteur.construire_dataframes([TRACES[nom] for nom in sorted(noms)])
+    df_params, df_events = moteur.finaliser_tables(df_params, df_events)
+    df_params = moteur.ajouter_metriques(df_params, df_events, None)
+    df_params, df_events = moteur.apparier_bidirectionnel(df_params, df_events)
+    df_hors_normes = moteur.appliquer_regles(df_params, df_events, moteur.preparer_regles(moteur.JEU_REGLES_DEFAUT))
+    return df_params, df_events, df_hors_normes
+
+def en_texte(df):
+    # Valeurs comparées telles qu'écrites dans le rapport, lignes dans leur ordre ; colonnes sans ordre imposé
+    df = df.astype(object).where(df.notna(), '').astype(str)
+    return df[sorted(df.columns)].reset_index(drop=True)
+
+def comparer(surveillance, noms):
+    df_params, df_events, df_hors_normes = analyse_complete(noms)
+    hors_normes = moteur.concatener_anomalies([surveillance.anomalies[nom] for nom, _, _ in surveillance.entrees])
+    for obtenu, attendu in ((surveillance.df_params, df_params), (surveillance.df_events, df_events),
+                            (hors_normes, df_hors_normes)):
+        pd.testing.assert_frame_equal(en_texte(obtenu), en_texte(attendu))
+    return len(df_hors_normes)
+
+def test_passages_identiques_a_une_analyse_complete(tmp_path, capsys):
+    dossier = tmp_path / 'depot'
+    dossier.mkdir()
+    surveillance = SurveillanceSynthetique([str(dossier)], str(tmp_path / 'rapport.xlsx'), format_sortie='csv')
+    alea = random.Random(1)
+    noms = list(TRACES)
+    presents = set()
+    # Lots déposés en plusieurs fois, puis un passage avec retraits et fichiers réécrits
+    for tour in range(5):
+        ajouts = alea.sample([nom for nom in noms if nom not in presents], 120) if tour < 4 else []
+        retraits = alea.sample(sorted(presents), 40) if tour == 4 else []
+        modifies = alea.sample(sorted(presents - set(retraits)), 5) if presents else []
+        for nom in ajouts:
+            (dossier / nom).write_text('x')
+        for nom in retraits:
+            (dossier / nom).unlink()
+        for nom in modifies:
+            with open(dossier / nom, 'a') as f:
+                f.write('y')
+        presents = (presents | set(ajouts)) - set(retraits)
+        # Premier passage : fichiers vus ; second : fichiers stables intégrés
+        surveillance.passage()
+        surveillance.passage()
+        assert comparer(surveillance, presents) > 0
+    assert len(pd.read_csv(tmp_path / 'rapport_parametres.csv')) == len(presents)
@@ -0,0 +1,52 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argos_moteur as moteur
+from bench_argos import traces_synthetiques
+
+# Contrôles par tranches de groupes (câble, NomBase) sur plusieurs processus, comparés au passage unique sur les
+# traces synthétiques du banc ; le seuil de partition est abaissé pour découper un petit lot
+
+pytestmark = pytest.mark.skipif(not moteur.PYARROW, reason="pyarrow requis pour partager les tables")
+
+class Releve:
+    # Mesures de chaque étape gardées pour savoir quelles règles ont été découpées
+    def __init__(self):
+        self.mesures = {}
+
+    @contextmanager
+    def etape(self, nom):
+        mesure = self.mesures[nom] = {}
+        yield mesure
+
+def tables_banc():
+    df_params, df_events = moteur.construire_dataframes(traces_synthetiques(1500, 7))
+    df_params, df_events = moteur.finaliser_tables(df_params, df_events)
+    df_params = moteur.ajouter_metriques(df_params, df_events, None)
+    return moteur.apparier_bidirectionnel(df_params, df_events)
+
+def controler(df_params, df_events, processus):
+    releve = Releve()
+    entrees = moteur.preparer_regles(moteur.JEU_REGLES_DEFAUT)
+    df_hors_normes = moteur.appliquer_regles(
+        df_params.copy(), df_events.copy(), entrees, profil=releve, processus=processus
+    )
+    return df_hors_normes, releve
+
+@pytest.mark.parametrize('processus', [2, 3])
+def test_tranches_identiques_au_passage_unique(monkeypatch, processus):
+    monkeypatch.setattr(moteur, 'LIGNES_MIN_PARTITION', 100)
+    df_params, df_events = tables_banc()
+    attendu, _ = controler(df_params, df_events, 1)
+    obtenu, releve = controler(df_params, df_events, processus)
+    decoupees = [nom for nom, mesure in releve.mesures.items() if mesure.get('processus') == processus]
+    assert decoupees == [nom for nom, definition, _ in moteur.preparer_regles(moteur.JEU_REGLES_DEFAUT)
+                         if definition['partitionnable']]
+    assert len(attendu) > 0
+    pd.testing.assert_frame_equal(obtenu, attendu)
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argos_moteur as moteur
+
+# Table de remplacement de la version d'origine, reprise telle quelle : référence des libellés décodés
+remplacement_types = {
+    r'0F9999.*': 'Epissure',
+    r'1E9999.*': 'Fin de fibre',
+    r'1F9999.*': 'Connecteur',
+    r'2E9999.*': 'Fin de fibre',
+    r'0A9999LS.*': 'Epissure',
+    r'1A9999LS.*': 'Connecteur',
+    r'0O99992P.*': 'Epissure',
+    r'1A9999OO.*': 'Connecteur',
+    r'0A9999OO.*': 'Epissure',
+    r'0O9999LS.*': 'Epissure',
+    r'0E99992P.*': 'Fin de fibre',
+    r'0E9999LS.*': 'Fin de fibre',
+    r'2F9999LS.*': 'Connecteur'
+}
+
+# Codes tels que pyotdr les écrit : 8 caractères lus dans le .sor, suivis ou non de sa description
+METHODES = ['LS', '2P', 'OO', 'NA']
+SUFFIXES = ['', ' {auto} reflection', ' {manual} loss/drop/gain']
+
+def codes_connus():
+    codes = []
+    for motif in remplacement_types:
+        debut = motif[:-2]
+        for methode in METHODES if len(debut) < 8 else ['']:
+            codes += [debut + methode + suffixe for suffixe in SUFFIXES]
+    return codes
+
+def test_libelles_de_la_version_origine():
+    codes = pd.Series(codes_connus(), dtype=object)
+    attendu = codes.replace(remplacement_types, regex=True)
+    obtenu = moteur.classer_types_evenements(codes).astype(object)
+    pd.testing.assert_series_equal(obtenu, attendu)
+
+CODES_INCONNUS = ['0F99', '0F9999', '1E999', '0F99 9LS', '0FABCDLS', '3F9999LS', '0X9999LS', 'inconnu']
+
+@pytest.mark.parametrize('code', CODES_INCONNUS)
+def test_code_mal_forme_non_classe(code):
+    assert moteur.decoder_type_evenement(code) == code
+
+def test_type_inconnu_signale():
+    codes = ['1F9999LS {auto} reflection', '0F0012LS {auto} loss/drop/gain'] + CODES_INCONNUS + ['1E9999LS']
+    params = {'Fichier': 'C1_F01.sor', 'filename': 'C1_F01.sor', 'loss end': 5.0, 'wavelength': '1310 nm'}
+    events = [
+        {'Fichier': 'C1_F01.sor', 'filename': 'C1_F01.sor', 'Event ID': str(k + 1), 'type': code,
+         'distance': f"{k * 0.1:.3f}", 'splice loss': '0.000', 'refl loss': '-50.000', 'slope': '0.330'}
+        for k, code in enumerate(codes)
+    ]
+    df_params, df_events = moteur.construire_dataframes([(params, events)])
+    df_params, df_events = moteur.finaliser_tables(df_params, df_events)
+    entrees = moteur.preparer_regles({'regles': ['types_evenements']})
+    df_hors_normes = moteur.appliquer_regles(df_params, df_events, entrees)
+    assert list(df_hors_normes['Anomalie'].unique()) == ["Type d'événement inconnu"]
+    assert list(df_hors_normes["Type d'évenements"]) == CODES_INCONNUS